@@ -1,23 +1,112 @@
 """
 Base Connector Interface
 """
+import hashlib
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
-from dataclasses import dataclass
+from collections import OrderedDict
+from concurrent.futures import Future
+from itertools import islice
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
+from dataclasses import dataclass, field, replace
 
 
 @dataclass
 class QueryResult:
-    """Result from executing a query"""
-    data: List[Dict[str, Any]]
+    """
+    Result from executing a query
+    Stored column-wise, either as an Arrow table or as a dict of column
+    lists; per-row dicts are only built when `data` is first accessed
+    """
     columns: List[str]
     row_count: int
     execution_time_ms: float
     sql_query: str
+    column_data: Optional[Dict[str, List[Any]]] = field(default=None, repr=False)
+    arrow: Optional[Any] = field(default=None, repr=False)  # pyarrow.Table
+    rows: Optional[List[Dict[str, Any]]] = field(default=None, repr=False)
+
+    @property
+    def data(self) -> List[Dict[str, Any]]:
+        """All rows as dicts (materialized on first access)"""
+        if self.rows is None:
+            self.rows = self.head(self.row_count)
+        return self.rows
+
+    def head(self, n: int) -> List[Dict[str, Any]]:
+        """First n rows as dicts, without materializing the rest"""
+        if self.rows is not None:
+            return self.rows[:n]
+        if self.arrow is not None:
+            return self.arrow.slice(0, n).to_pylist()
+        if self.column_data:
+            columns = tuple(self.columns)
+            return [dict(zip(columns, row)) for row in islice(zip(*self.column_data.values()), n)]
+        return []
+
+    def head_columns(self, n: int) -> Dict[str, List[Any]]:
+        """First n rows as {column: values}, without building row dicts"""
+        if self.rows is None and self.arrow is not None:
+            return self.arrow.slice(0, n).to_pydict()
+        if self.rows is None and self.column_data is not None:
+            return {col: values[:n] for col, values in self.column_data.items()}
+        rows = self.head(n)
+        return {col: [row.get(col) for row in rows] for col in self.columns}
+
+    def head_strings(self, n: int) -> Dict[str, List[str]]:
+        """First n rows as {column: display strings}"""
+        if self.rows is None and self.arrow is not None:
+            import pyarrow as pa
+            import pyarrow.compute as pc
+
+            preview = self.arrow.slice(0, n)
+            columns = {}
+            for name, col in zip(preview.schema.names, preview.columns):
+                t = col.type
+                if (pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_decimal(t)
+                        or pa.types.is_string(t) or pa.types.is_date(t)):
+                    # Vectorized; other types keep Python's formatting
+                    columns[name] = pc.cast(col, pa.string()).fill_null('None').to_pylist()
+                else:
+                    columns[name] = [str(v) for v in col.to_pylist()]
+            return columns
+        return {col: [str(v) for v in values] for col, values in self.head_columns(n).items()}
+
+    def column(self, name: str) -> List[Any]:
+        """All values of one column"""
+        if self.arrow is not None:
+            return self.arrow.column(name).to_pylist()
+        if self.column_data is not None:
+            return self.column_data[name]
+        return [row.get(name) for row in self.data]
+
+    def iter_dicts(self) -> Iterator[Dict[str, Any]]:
+        """Iterate rows as dicts, one Arrow batch at a time"""
+        if self.rows is None and self.arrow is not None:
+            for batch in self.arrow.to_batches():
+                yield from batch.to_pylist()
+        elif self.rows is None and self.column_data:
+            for row in zip(*self.column_data.values()):
+                yield dict(zip(self.columns, row))
+        else:
+            yield from self.data
 
 
 class BaseConnector(ABC):
-    """Abstract base class for database connectors"""
+    """
+    Abstract base class for database connectors
+    Repeated SELECTs are served from a bounded LRU result cache
+    """
+
+    def __init__(self, cache_max_entries: int = 128, cache_ttl: float = 60):
+        self._result_cache: 'OrderedDict[bytes, Tuple[float, QueryResult]]' = OrderedDict()
+        self._cache_max_entries = cache_max_entries
+        self._cache_ttl = cache_ttl
+        self._catalog_cache: Optional[Dict[str, Dict[str, Any]]] = None
+        # Identical SELECTs already running, so concurrent callers share one
+        self._inflight: Dict[bytes, Future] = {}
+        self._cache_lock = threading.Lock()
 
     @abstractmethod
     def connect(self) -> bool:
@@ -27,8 +116,83 @@ class BaseConnector(ABC):
     def disconnect(self) -> None:
         pass
 
+    def execute(self, sql: str, template: Optional[str] = None, params: Sequence[Any] = ()) -> QueryResult:
+        """
+        Execute SQL, returning a cached result for repeated SELECTs
+        Concurrent identical SELECTs wait for a single backend query
+        template/params optionally give sql with $n placeholders, letting
+        connectors that support it reuse a prepared plan; a template
+        without params is ignored
+        """
+        if sql.lstrip()[:6].upper() != 'SELECT':
+            # Anything else may modify data - drop cached results
+            self.clear_cache()
+            return self._execute(sql)
+
+        key = self._cache_key(sql)
+        with self._cache_lock:
+            cached = self._result_cache.get(key)
+            if cached and time.monotonic() - cached[0] < self._cache_ttl:
+                self._result_cache.move_to_end(key)
+                return replace(cached[1], execution_time_ms=0.0)
+
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self._inflight[key] = Future()
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            if template and params:
+                result = self._execute_prepared(template, params, sql)
+            else:
+                result = self._execute(sql)
+        except BaseException as e:
+            with self._cache_lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._cache_lock:
+            self._result_cache[key] = (time.monotonic(), result)
+            self._result_cache.move_to_end(key)
+            if len(self._result_cache) > self._cache_max_entries:
+                self._result_cache.popitem(last=False)
+            del self._inflight[key]
+        future.set_result(result)
+        return result
+
+    def clear_cache(self) -> None:
+        """Drop all cached query results and catalog info"""
+        with self._cache_lock:
+            self._result_cache.clear()
+            self._catalog_cache = None
+
+    @staticmethod
+    def _cache_key(sql: str) -> bytes:
+        # Not lowercased: string literals in filters are case-sensitive
+        return hashlib.blake2b(sql.strip().encode(), digest_size=16).digest()
+
+    @abstractmethod
+    def _execute(self, sql: str) -> QueryResult:
+        """Run SQL against the database, bypassing the result cache"""
+        pass
+
+    def _execute_prepared(self, template: str, params: Sequence[Any], sql: str) -> QueryResult:
+        """Run a parameterized SELECT; plain execution unless overridden"""
+        return self._execute(sql)
+
+    def get_all_table_info(self) -> Dict[str, Dict[str, Any]]:
+        """Get info for every table, fetched in a single catalog query"""
+        if self._catalog_cache is None:
+            self._catalog_cache = self._load_catalog()
+        return self._catalog_cache
+
     @abstractmethod
-    def execute(self, sql: str) -> QueryResult:
+    def _load_catalog(self) -> Dict[str, Dict[str, Any]]:
+        """Fetch {table_name: {'table_name', 'row_count'}} for all tables"""
         pass
 
     @abstractmethod
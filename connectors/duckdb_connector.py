@@ -1,71 +1,205 @@
 """
 DuckDB Connector - For local DuckDB databases
 """
+import queue
+import sys
+import threading
 import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Sequence
 import duckdb
 from .base import BaseConnector, QueryResult
 
 
+class DuckDBPool:
+    """
+    Fixed set of cursors on one read-only database handle
+    Each cursor is an independent execution context, so queries on
+    different cursors run in parallel
+    """
+
+    def __init__(self, db_path: str, size: int = 4, threads: Optional[int] = None,
+                 memory_limit: Optional[str] = None):
+        # Settings are applied once, when the handle is opened; the cursors
+        # share them, so nothing is re-run per cursor or per query
+        config = {}
+        if threads:
+            config['threads'] = threads
+        if memory_limit:
+            config['memory_limit'] = memory_limit
+        self.conn = duckdb.connect(str(db_path), read_only=True, config=config)
+        self.size = size
+        # LIFO so the most recently used (warmest) cursor is handed out first
+        self._idle: 'queue.LifoQueue[duckdb.DuckDBPyConnection]' = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(self.conn.cursor())
+
+    @contextmanager
+    def acquire(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """Borrow a cursor, waiting if all are busy"""
+        cursor = self._idle.get()
+        try:
+            yield cursor
+        finally:
+            self._idle.put(cursor)
+
+    def close(self):
+        """Close all cursors and the database handle"""
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+        self.conn.close()
+
+
 class DuckDBConnector(BaseConnector):
     """Connector for local DuckDB databases"""
 
-    def __init__(self, db_path: str):
+    # Prepared statements kept per cursor before the least recently used is dropped
+    MAX_PREPARED = 64
+
+    def __init__(self, db_path: str, threads: Optional[int] = None, memory_limit: Optional[str] = None,
+                 pool_size: int = 4, cache_max_entries: int = 128, cache_ttl: float = 60):
+        super().__init__(cache_max_entries=cache_max_entries, cache_ttl=cache_ttl)
         self.db_path = Path(db_path)
-        self.conn = None
+        self.threads = threads
+        self.memory_limit = memory_limit  # e.g. "4GB"; DuckDB default is 80% of RAM
+        self.pool_size = pool_size
+        self.pool: Optional[DuckDBPool] = None
+        # Prepared statements live on the cursor that prepared them:
+        # cursor -> {template: statement name}
+        self._prepared: Dict[Any, 'OrderedDict[str, str]'] = {}
+        self._stmt_counter = 0
+        self._stmt_lock = threading.Lock()
+
+    @property
+    def conn(self) -> Optional[duckdb.DuckDBPyConnection]:
+        """The shared database handle, while connected"""
+        return self.pool.conn if self.pool else None
 
     def connect(self) -> bool:
+        if self.pool:
+            return True  # Already open and configured
         try:
             if not self.db_path.exists():
                 raise FileNotFoundError(f"Database not found: {self.db_path}")
-            self.conn = duckdb.connect(str(self.db_path), read_only=True)
+            # One long-lived handle with a few cursors; DuckDB parallelizes
+            # each query over `threads` workers (all cores by default). All
+            # settings go in the connect config, applied once when the
+            # database is opened and shared by every cursor, instead of
+            # SET/PRAGMA statements. Metadata/Parquet caching needs no
+            # setup: the external file cache is on by default and PRAGMA
+            # enable_object_cache is a legacy no-op.
+            self.pool = DuckDBPool(
+                str(self.db_path), size=self.pool_size,
+                threads=self.threads, memory_limit=self.memory_limit
+            )
+            self._prepared = {}
             return True
         except Exception as e:
             print(f"DuckDB connection error: {e}")
             return False
 
     def disconnect(self) -> None:
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+        self._prepared = {}
+        self.clear_cache()
 
-    def execute(self, sql: str) -> QueryResult:
-        if not self.conn:
+    @contextmanager
+    def cursor(self) -> Iterator[duckdb.DuckDBPyConnection]:
+        """Borrow a pooled cursor, connecting first if needed"""
+        if not self.pool:
             self.connect()
+        with self.pool.acquire() as cursor:
+            yield cursor
 
-        start_time = time.time()
-        result = self.conn.execute(sql)
-        rows = result.fetchall()
-        columns = [desc[0] for desc in result.description]
-        data = [dict(zip(columns, row)) for row in rows]
-        execution_time = (time.time() - start_time) * 1000
+    def _execute(self, sql: str) -> QueryResult:
+        start_ns = time.perf_counter_ns()
+        # A cursor is an independent execution context on the same
+        # database, so concurrent callers do not share result state
+        with self.cursor() as cursor:
+            return self._run(cursor, sql, sql, start_ns)
+
+    @staticmethod
+    def _run(cursor: duckdb.DuckDBPyConnection, statement: str, sql: str, start_ns: int) -> QueryResult:
+        """Run statement on the cursor; the result reports sql and the time since start_ns"""
+        arrow = cursor.execute(statement).to_arrow_table()
+        execution_time_ms = (time.perf_counter_ns() - start_ns) / 1_000_000
 
         return QueryResult(
-            data=data,
-            columns=columns,
-            row_count=len(data),
-            execution_time_ms=round(execution_time, 2),
-            sql_query=sql
+            columns=[sys.intern(name) for name in arrow.schema.names],
+            row_count=arrow.num_rows,
+            execution_time_ms=execution_time_ms,
+            sql_query=sql,
+            arrow=arrow
         )
 
+    def _execute_prepared(self, template: str, params: Sequence[Any], sql: str) -> QueryResult:
+        """Run through a statement prepared once per template and cursor (parse/plan reused)"""
+        # EXECUTE rejects bound parameters, so its arguments are written
+        # inline; only plain ints are, anything else runs the literal SQL
+        if not all(type(p) is int for p in params):
+            return self._execute(sql)
+
+        start_ns = time.perf_counter_ns()
+        with self.cursor() as cursor:
+            # Only the thread holding the cursor touches its statements
+            with self._stmt_lock:
+                prepared = self._prepared.setdefault(cursor, OrderedDict())
+            stmt = prepared.get(template)
+            if stmt is None:
+                with self._stmt_lock:
+                    self._stmt_counter += 1
+                    stmt = f"stmt_{self._stmt_counter}"
+                try:
+                    cursor.execute(f"PREPARE {stmt} AS {template}")
+                except duckdb.Error:
+                    # A placeholder DuckDB cannot type; run the literal SQL
+                    return self._run(cursor, sql, sql, start_ns)
+                prepared[template] = stmt
+                if len(prepared) > self.MAX_PREPARED:
+                    _, oldest = prepared.popitem(last=False)
+                    cursor.execute(f"DEALLOCATE {oldest}")
+            else:
+                prepared.move_to_end(template)
+
+            args = f"({', '.join(map(str, params))})" if params else ""
+            return self._run(cursor, f"EXECUTE {stmt}{args}", sql, start_ns)
+
+    def _load_catalog(self) -> Dict[str, Dict[str, Any]]:
+        with self.cursor() as cursor:
+            rows = cursor.execute("""
+                SELECT table_name, estimated_size FROM duckdb_tables()
+                WHERE database_name = current_database() AND schema_name = current_schema()
+                ORDER BY table_name
+            """).fetchall()
+        return {name: {'table_name': name, 'row_count': size} for name, size in rows}
+
     def list_tables(self) -> List[str]:
-        if not self.conn:
-            self.connect()
-        result = self.conn.execute("SHOW TABLES").fetchall()
-        return [row[0] for row in result]
+        return list(self.get_all_table_info())
 
     def get_table_info(self, table_name: str) -> Dict[str, Any]:
-        if not self.conn:
-            self.connect()
-        count = self.conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
-        return {'table_name': table_name, 'row_count': count}
+        info = self.get_all_table_info().get(table_name)
+        if info:
+            return info
+        with self.cursor() as cursor:
+            # Bound parameters instead of interpolating the name into SQL
+            schema, _, name = table_name.rpartition('.')
+            row = cursor.execute("""
+                SELECT estimated_size FROM duckdb_tables()
+                WHERE table_name = ? AND schema_name = COALESCE(NULLIF(?, ''), current_schema())
+            """, [name, schema]).fetchone()
+            if row is None:
+                quoted = '.'.join('"' + part.replace('"', '""') + '"' for part in table_name.split('.'))
+                row = cursor.execute(f"SELECT COUNT(*) FROM {quoted}").fetchone()
+        return {'table_name': table_name, 'row_count': row[0]}
 
     def test_connection(self) -> bool:
         try:
-            if not self.conn:
-                self.connect()
-            self.conn.execute("SELECT 1").fetchone()
+            with self.cursor() as cursor:
+                cursor.execute("SELECT 1").fetchone()
             return True
         except:
             return False
@@ -3,17 +3,92 @@ Conversation Memory - Enables multi-turn conversations
 Remembers context, handles follow-ups, resolves pronouns
 """
 import json
+import os
+import re
+import time
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass, asdict
+from collections import deque
+from itertools import islice
+from typing import List, Dict, Any, Deque, Iterator, Optional
+from dataclasses import dataclass, asdict, is_dataclass
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the stdlib json module
+    orjson = None
+
+FOLLOW_UP_INDICATORS = (
+    'show me more', 'more details', 'what about',
+    'instead', 'also', 'and what', 'how about',
+    'the same', 'that', 'this', 'it', 'those',
+    'break it down', 'drill down', 'filter',
+    'last year', 'this year', 'by month', 'by region',
+    'top', 'highest', 'lowest', 'compare',
+    'why', 'which one', 'who'
+)
+
+# All indicators in one alternation, matched in a single pass; word
+# boundaries keep short words like 'it' from matching inside 'with'
+_FOLLOW_UP_RE = re.compile(r'\b(?:' + '|'.join(map(re.escape, FOLLOW_UP_INDICATORS)) + r')\b')
+
+# Follow-up phrases and how each rewrites the previous intent:
+# (phrase, slot, value). Phrases match anywhere in the lowercased question,
+# like a substring test, so 'by customer' also hits 'by customers'. When
+# several phrases hit the same slot, the one listed first here wins;
+# 'filters' values are appended.
+_FOLLOW_UP_RULES = (
+    ('by month', 'group_by', ('month_name',)),
+    ('by year', 'group_by', ('year',)),
+    ('by region', 'group_by', ('region',)),
+    ('by customer', 'group_by', ('customer_segment',)),
+    ('by segment', 'group_by', ('customer_segment',)),
+    ('last year', 'time_period', "d_date.year = YEAR(CURRENT_DATE) - 1"),
+    ('this year', 'time_period', "d_date.year = YEAR(CURRENT_DATE)"),
+    ('last month', 'time_period', "d_date.month = MONTH(CURRENT_DATE) - 1"),
+    ('premium', 'filters', "customer_segment = 'Premium'"),
+    ('gold', 'filters', "customer_segment = 'Gold'"),
+)
+_FOLLOW_UP_RULE_RANK = {phrase: rank for rank, (phrase, _, _) in enumerate(_FOLLOW_UP_RULES)}
+_FOLLOW_UP_RULE_RE = re.compile('|'.join(map(re.escape, _FOLLOW_UP_RULE_RANK)))
+
+
+# Longest first-row text kept in a turn's results_summary
+SUMMARY_MAX_LEN = 200
+
+# Compact the history file on load once it holds this many times max_turns
+COMPACT_FACTOR = 10
+
+# Intent slots holding lists of names/conditions
+_INTENT_LIST_SLOTS = frozenset({'metrics', 'dimensions', 'group_by', 'filters'})
+
+
+def _json_default(obj):
+    if is_dataclass(obj):
+        return asdict(obj)
+    if hasattr(obj, 'tolist'):  # NumPy arrays and scalars
+        return obj.tolist()
+    return str(obj)
+
+
+def _dumps(obj) -> bytes:
+    """Serialize to JSON bytes (orjson encodes dataclasses and NumPy natively)"""
+    if orjson:
+        return orjson.dumps(
+            obj, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(obj, default=_json_default).encode()
+
+
+def _loads(data: bytes):
+    return orjson.loads(data) if orjson else json.loads(data)
+
 
 @dataclass
 class ConversationTurn:
     """Single turn in a conversation"""
     turn_id: int
-    timestamp: str
+    timestamp: float  # Unix epoch seconds
     user_question: str
     parsed_intent: Dict[str, Any]
     sql_query: str
@@ -21,6 +96,22 @@ class ConversationTurn:
     full_response: str
     row_count: int
 
+    def __post_init__(self):
+        # Legacy single-document histories (see _migrate_legacy_history)
+        # stored ISO timestamps and JSON lists
+        if isinstance(self.timestamp, str):
+            self.timestamp = datetime.fromisoformat(self.timestamp).timestamp()
+        # List slots are kept as tuples so follow-ups can share them uncopied
+        self.parsed_intent = {
+            key: tuple(value) if key in _INTENT_LIST_SLOTS and value is not None else value
+            for key, value in self.parsed_intent.items()
+        }
+
+    @property
+    def created_at(self) -> datetime:
+        """Turn time as a local datetime"""
+        return datetime.fromtimestamp(self.timestamp)
+
 
 class ConversationMemory:
     """
@@ -30,11 +121,15 @@ class ConversationMemory:
 
     def __init__(self, max_turns: int = 10, persist_file: str = None):
         self.max_turns = max_turns
-        self.history: List[ConversationTurn] = []
+        self.history: Deque[ConversationTurn] = deque(maxlen=max_turns)
         self.current_context: Dict[str, Any] = {}
         self.persist_file = persist_file
         self.turn_counter = 0
 
+        # Formatted LLM context, rebuilt only after the history changes
+        self._ctx_cache = ''
+        self._ctx_dirty = True
+
         # Load previous session if exists
         if persist_file:
             self._load_history()
@@ -45,52 +140,77 @@ class ConversationMemory:
         parsed_intent: Dict[str, Any],
         sql_query: str,
         results: List[Dict],
-        response: str
+        response: str,
+        row_count: Optional[int] = None
     ) -> ConversationTurn:
-        """Add a new conversation turn"""
+        """
+        Add a new conversation turn
+        results may be just the leading rows; row_count is the full total
+        """
         self.turn_counter += 1
+        if row_count is None:
+            row_count = len(results)
 
         # Create summary of results
-        results_summary = self._summarize_results(results)
+        results_summary = self._summarize_results(
+            results,
+            keys=[*parsed_intent.get('metrics', []), *parsed_intent.get('group_by', [])],
+            row_count=row_count
+        )
 
         turn = ConversationTurn(
             turn_id=self.turn_counter,
-            timestamp=datetime.now().isoformat(),
+            timestamp=time.time(),
             user_question=user_question,
             parsed_intent=parsed_intent,
             sql_query=sql_query,
             results_summary=results_summary,
             full_response=response,
-            row_count=len(results)
+            row_count=row_count
         )
 
+        # The deque evicts the oldest turn once max_turns is reached
         self.history.append(turn)
 
         # Update current context
         self._update_context(turn, results)
 
-        # Trim old history
-        if len(self.history) > self.max_turns:
-            self.history = self.history[-self.max_turns:]
-
         # Persist if enabled
         if self.persist_file:
-            self._save_history()
+            self._append_turn(turn)
+            self._save_state()
 
         return turn
 
-    def _summarize_results(self, results: List[Dict]) -> str:
-        """Create a brief summary of results"""
+    def _summarize_results(
+        self,
+        results: List[Dict],
+        keys: Optional[List[str]] = None,
+        max_len: int = SUMMARY_MAX_LEN,
+        row_count: Optional[int] = None
+    ) -> str:
+        """Create a brief summary of results, capped at max_len characters"""
         if not results:
             return "No results"
 
-        if len(results) == 1:
-            return str(results[0])
+        first = results[0]
+        if keys:
+            # Only the requested metrics/groupings, not every wide column
+            first = {k: first[k] for k in keys if k in first} or first
+        first_str = str(first)
+        if len(first_str) > max_len:
+            first_str = first_str[:max_len] + '…'
+
+        if row_count is None:
+            row_count = len(results)
+        if row_count == 1:
+            return first_str
 
-        return f"{len(results)} rows returned. First: {results[0]}"
+        return f"{row_count} rows returned. First: {first_str}"
 
     def _update_context(self, turn: ConversationTurn, results: List[Dict]):
         """Update current context based on latest turn"""
+        self._ctx_dirty = True
         self.current_context = {
             'last_metrics': turn.parsed_intent.get('metrics', []),
             'last_dimensions': turn.parsed_intent.get('group_by', []),
@@ -98,30 +218,45 @@ class ConversationMemory:
             'last_time_period': turn.parsed_intent.get('time_period'),
             'last_sql': turn.sql_query,
             'last_results': results[:10] if results else [],  # Keep first 10
-            'last_row_count': len(results),
+            'last_row_count': turn.row_count,
             'last_question': turn.user_question
         }
 
     def get_context_for_llm(self) -> str:
         """Get formatted context for LLM prompt"""
+        if self._ctx_dirty:
+            self._ctx_cache = self._build_context_for_llm()
+            self._ctx_dirty = False
+        return self._ctx_cache
+
+    def _build_context_for_llm(self) -> str:
         if not self.history:
             return "No previous conversation."
 
         context_parts = ["Previous conversation:"]
+        context_parts.extend(
+            f"\nUser: {turn.user_question}\nResult: {turn.results_summary}"
+            for turn in self._recent_turns(5)
+        )
 
-        for turn in self.history[-5:]:  # Last 5 turns
-            context_parts.append(f"\nUser: {turn.user_question}")
-            context_parts.append(f"Result: {turn.results_summary}")
-
-        if self.current_context:
-            context_parts.append(f"\nCurrent context:")
-            context_parts.append(f"- Last metrics: {self.current_context.get('last_metrics', [])}")
-            context_parts.append(f"- Last grouping: {self.current_context.get('last_dimensions', [])}")
-            if self.current_context.get('last_filters'):
-                context_parts.append(f"- Active filters: {self.current_context.get('last_filters')}")
+        ctx = self.current_context
+        if ctx:
+            # Slots are tuples in memory; shown as lists, as the prompt always had them
+            context_parts.append(
+                f"\nCurrent context:\n"
+                f"- Last metrics: {list(ctx.get('last_metrics') or [])}\n"
+                f"- Last grouping: {list(ctx.get('last_dimensions') or [])}"
+            )
+            last_filters = ctx.get('last_filters')
+            if last_filters:
+                context_parts.append(f"- Active filters: {list(last_filters)}")
 
         return "\n".join(context_parts)
 
+    def _recent_turns(self, n: int) -> Iterator[ConversationTurn]:
+        """Iterate the last n turns, oldest first"""
+        return islice(self.history, max(0, len(self.history) - n), None)
+
     def get_last_intent(self) -> Optional[Dict[str, Any]]:
         """Get the intent from the last turn"""
         if self.history:
@@ -132,100 +267,97 @@ class ConversationMemory:
         """Get results from last query"""
         return self.current_context.get('last_results', [])
 
-    def is_follow_up(self, question: str) -> bool:
-        """Detect if this is a follow-up question"""
+    def is_follow_up(self, question: str, question_lower: Optional[str] = None) -> bool:
+        """Detect if this is a follow-up question (question_lower: question.lower(), if at hand)"""
         if not self.history:
             return False
+        if question_lower is None:
+            question_lower = question.lower()
+        return _FOLLOW_UP_RE.search(question_lower) is not None
 
-        follow_up_indicators = [
-            'show me more', 'more details', 'what about',
-            'instead', 'also', 'and what', 'how about',
-            'the same', 'that', 'this', 'it', 'those',
-            'break it down', 'drill down', 'filter',
-            'last year', 'this year', 'by month', 'by region',
-            'top', 'highest', 'lowest', 'compare',
-            'why', 'which one', 'who'
-        ]
-
-        question_lower = question.lower()
-        return any(indicator in question_lower for indicator in follow_up_indicators)
-
-    def resolve_follow_up(self, question: str) -> Dict[str, Any]:
+    def resolve_follow_up(self, question: str, question_lower: Optional[str] = None) -> Dict[str, Any]:
         """
         Resolve follow-up question using context
         Returns modified intent based on previous context
         """
         if not self.history:
             return {}
+        if question_lower is None:
+            question_lower = question.lower()
 
         last_intent = self.get_last_intent()
         if not last_intent:
             return {}
 
+        # Slots are immutable tuples, so they are shared rather than copied;
+        # rules below replace a slot instead of mutating it
         resolved = {
-            'metrics': last_intent.get('metrics', []).copy(),
-            'dimensions': last_intent.get('dimensions', []).copy(),
-            'group_by': last_intent.get('group_by', []).copy(),
-            'filters': last_intent.get('filters', []).copy(),
+            'metrics': last_intent.get('metrics', ()),
+            'dimensions': last_intent.get('dimensions', ()),
+            'group_by': last_intent.get('group_by', ()),
+            'filters': last_intent.get('filters', ()),
             'time_period': last_intent.get('time_period'),
             'is_follow_up': True,
             'base_question': self.current_context.get('last_question', '')
         }
 
-        question_lower = question.lower()
-
-        # Handle "by month" / "by region" modifications
-        if 'by month' in question_lower:
-            resolved['group_by'] = ['month_name']
-        elif 'by year' in question_lower:
-            resolved['group_by'] = ['year']
-        elif 'by region' in question_lower:
-            resolved['group_by'] = ['region']
-        elif 'by customer' in question_lower or 'by segment' in question_lower:
-            resolved['group_by'] = ['customer_segment']
-
-        # Handle time period changes
-        if 'last year' in question_lower:
-            resolved['time_period'] = "d_date.year = YEAR(CURRENT_DATE) - 1"
-        elif 'this year' in question_lower:
-            resolved['time_period'] = "d_date.year = YEAR(CURRENT_DATE)"
-        elif 'last month' in question_lower:
-            resolved['time_period'] = "d_date.month = MONTH(CURRENT_DATE) - 1"
-
-        # Handle filter additions
-        if 'premium' in question_lower:
-            resolved['filters'].append("customer_segment = 'Premium'")
-        elif 'gold' in question_lower:
-            resolved['filters'].append("customer_segment = 'Gold'")
+        # Pick the winning rule per slot from a single scan of the question
+        winners: Dict[str, int] = {}
+        for match in _FOLLOW_UP_RULE_RE.finditer(question_lower):
+            rank = _FOLLOW_UP_RULE_RANK[match.group()]
+            slot = _FOLLOW_UP_RULES[rank][1]
+            if rank < winners.get(slot, len(_FOLLOW_UP_RULES)):
+                winners[slot] = rank
+
+        for slot, rank in winners.items():
+            value = _FOLLOW_UP_RULES[rank][2]
+            if slot == 'filters':
+                resolved['filters'] = resolved['filters'] + (value,)
+            else:
+                resolved[slot] = value
 
         return resolved
 
     def clear(self):
         """Clear conversation history"""
-        self.history = []
+        self.history.clear()
         self.current_context = {}
         self.turn_counter = 0
+        self._ctx_dirty = True
 
         if self.persist_file:
-            self._save_history()
+            open(self.persist_file, 'w').close()
+            self._save_state()
 
-    def _save_history(self):
-        """Save history to file"""
-        if not self.persist_file:
-            return
+    def _state_path(self) -> Path:
+        """Companion file holding current context and turn counter"""
+        path = Path(self.persist_file)
+        return path.with_name(path.stem + '.state.json')
+
+    def _append_turn(self, turn: ConversationTurn):
+        """Append a single turn to the JSON-Lines history file"""
+        with open(self.persist_file, 'ab') as f:
+            f.write(_dumps(turn) + b'\n')
 
+    def _compact(self):
+        """Rewrite the history file with only the turns currently held"""
         path = Path(self.persist_file)
-        data = {
-            'turns': [asdict(t) for t in self.history],
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.writelines(_dumps(turn) + b'\n' for turn in self.history)
+        os.replace(tmp_path, path)
+
+    def _save_state(self):
+        """Save context and turn counter (bounded size, rewritten per turn)"""
+        state = {
             'context': self.current_context,
             'turn_counter': self.turn_counter
         }
-
-        with open(path, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        with open(self._state_path(), 'wb') as f:
+            f.write(_dumps(state))
 
     def _load_history(self):
-        """Load history from file"""
+        """Load history from file, one turn per line"""
         if not self.persist_file:
             return
 
@@ -234,16 +366,63 @@ class ConversationMemory:
             return
 
         try:
-            with open(path, 'r') as f:
-                data = json.load(f)
-
-            self.history = [
-                ConversationTurn(**t) for t in data.get('turns', [])
-            ]
-            self.current_context = data.get('context', {})
-            self.turn_counter = data.get('turn_counter', 0)
+            # Histories written before the JSON-Lines format are a single
+            # indented JSON document, whose first line is just "{"
+            with open(path, 'rb') as f:
+                first_line = f.readline()
+            if first_line.strip() == b'{':
+                self._migrate_legacy_history(path)
+                return
+
+            line_count = 0
+            parsed_count = 0
+            with open(path, 'rb') as f:
+                for line in f:
+                    line_count += 1
+                    try:
+                        self.history.append(ConversationTurn(**_loads(line)))
+                    except (ValueError, TypeError):
+                        # Skip blank, truncated or malformed lines
+                        continue
+                    parsed_count += 1
+
+            # The file is append-only; once it holds far more turns than
+            # are kept, rewrite it with just the retained ones. A file with
+            # no readable turn at all is not ours to rewrite.
+            if parsed_count and line_count > COMPACT_FACTOR * self.max_turns:
+                self._compact()
+
+            state_path = self._state_path()
+            if state_path.exists():
+                with open(state_path, 'rb') as f:
+                    state = _loads(f.read())
+                self.current_context = state.get('context', {})
+                self.turn_counter = state.get('turn_counter', 0)
+            elif self.history:
+                self.turn_counter = self.history[-1].turn_id
         except Exception as e:
             print(f"Could not load history: {e}")
+        self._ctx_dirty = True
+
+    def _migrate_legacy_history(self, path: Path):
+        """Load a legacy {'turns', 'context', 'turn_counter'} file and rewrite it as JSON Lines"""
+        try:
+            data = _loads(path.read_bytes())
+            turns = [ConversationTurn(**t) for t in data['turns']]
+        except (ValueError, TypeError, KeyError) as e:
+            # Not a legacy history after all; leave the file untouched
+            print(f"Could not load history: {e}")
+            return
+
+        self.history.extend(turns)
+        self.current_context = data.get('context', {})
+        self.turn_counter = data.get('turn_counter') or (turns[-1].turn_id if turns else 0)
+        self._ctx_dirty = True
+
+        # Legacy files were trimmed to max_turns on every save, so the
+        # rewrite keeps all of their turns (unless max_turns shrank)
+        self._compact()
+        self._save_state()
 
     def get_conversation_summary(self) -> str:
         """Get a summary of the conversation for display"""
@@ -251,8 +430,10 @@ class ConversationMemory:
             return "No conversation history"
 
         lines = [f"Conversation ({len(self.history)} turns):"]
-        for turn in self.history[-5:]:
-            lines.append(f"  [{turn.turn_id}] Q: {turn.user_question[:50]}...")
-            lines.append(f"      → {turn.row_count} results")
+        lines.extend(
+            f"  [{turn.turn_id}] Q: {turn.user_question[:50]}...\n"
+            f"      → {turn.row_count} results"
+            for turn in self._recent_turns(5)
+        )
 
         return "\n".join(lines)
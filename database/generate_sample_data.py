@@ -2,8 +2,10 @@
 Generate sample BFSI data for the OLAP database
 """
 import duckdb
-import random
-from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Configuration
@@ -13,40 +15,61 @@ NUM_PRODUCTS = 50
 NUM_DAYS = 365  # Last 1 year
 NUM_TRANSACTIONS = 50000
 
+# Vectorized random source for whole columns at a time
+rng = np.random.default_rng()
+
+
+def append_rows(conn, table, rows):
+    """
+    Bulk-load row tuples (in table column order) into table
+    Goes through a DataFrame scan instead of one INSERT per row
+    """
+    conn.append(table, pd.DataFrame.from_records(rows))
+
+
+def insert_columns(conn, table, columns):
+    """
+    Bulk-load a {column_name: values} mapping into table
+    The Arrow table is scanned in place by DuckDB, matched to columns by name
+    """
+    conn.register('staging', pa.Table.from_pydict(columns))
+    try:
+        conn.execute(f"INSERT INTO {table} BY NAME SELECT * FROM staging")
+    finally:
+        conn.unregister('staging')
+
+
+def run_on_cursor(conn, generator):
+    """Run a generator on its own cursor, for use from a worker thread"""
+    with conn.cursor() as cursor:
+        return generator(cursor)
+
 def generate_date_dimension(conn):
-    """Generate date dimension for the last year"""
+    """Generate date dimension for the last year; returns its date keys"""
     print("Generating date dimension...")
 
-    start_date = datetime.now() - timedelta(days=NUM_DAYS)
-    dates = []
-
-    for i in range(NUM_DAYS):
-        current_date = start_date + timedelta(days=i)
-        dates.append({
-            'date_key': int(current_date.strftime('%Y%m%d')),
-            'date': current_date.strftime('%Y-%m-%d'),
-            'year': current_date.year,
-            'quarter': (current_date.month - 1) // 3 + 1,
-            'month': current_date.month,
-            'month_name': current_date.strftime('%B'),
-            'week': current_date.isocalendar()[1],
-            'day': current_date.day,
-            'day_of_week': current_date.weekday(),
-            'day_name': current_date.strftime('%A'),
-            'is_weekend': current_date.weekday() >= 5,
-            'is_holiday': random.random() < 0.05
-        })
-
-    conn.execute("DELETE FROM dim_date")
-    conn.executemany("""
-        INSERT INTO dim_date VALUES (
-            ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
-        )
-    """, [(d['date_key'], d['date'], d['year'], d['quarter'], d['month'],
-           d['month_name'], d['week'], d['day'], d['day_of_week'],
-           d['day_name'], d['is_weekend'], d['is_holiday']) for d in dates])
-
-    print(f"  Generated {len(dates)} date records")
+    days = pd.date_range(start=pd.Timestamp.now().normalize() - pd.Timedelta(days=NUM_DAYS), periods=NUM_DAYS)
+    day_of_week = days.dayofweek.to_numpy()
+
+    columns = {
+        'date_key': (days.year * 10000 + days.month * 100 + days.day).to_numpy(),
+        'date': days.date,
+        'year': days.year.to_numpy(),
+        'quarter': days.quarter.to_numpy(),
+        'month': days.month.to_numpy(),
+        'month_name': days.month_name().to_numpy(),
+        'week': days.isocalendar().week.to_numpy('int32'),
+        'day': days.day.to_numpy(),
+        'day_of_week': day_of_week,
+        'day_name': days.day_name().to_numpy(),
+        'is_weekend': day_of_week >= 5,
+        'is_holiday': rng.random(NUM_DAYS) < 0.05,
+    }
+
+    insert_columns(conn, 'dim_date', columns)
+
+    print(f"  Generated {NUM_DAYS} date records")
+    return columns['date_key']
 
 def generate_customer_dimension(conn):
     """Generate customer dimension"""
@@ -64,38 +87,32 @@ def generate_customer_dimension(conn):
               'San Antonio', 'San Diego', 'Dallas', 'San Jose']
     states = ['NY', 'CA', 'IL', 'TX', 'AZ', 'PA', 'TX', 'CA', 'TX', 'CA']
 
-    customers = []
-    for i in range(1, NUM_CUSTOMERS + 1):
-        city_idx = random.randint(0, len(cities) - 1)
-        customers.append({
-            'customer_key': i,
-            'customer_id': f'CUST{i:06d}',
-            'first_name': random.choice(first_names),
-            'last_name': random.choice(last_names),
-            'age': random.randint(18, 80),
-            'gender': random.choice(['M', 'F']),
-            'occupation': random.choice(occupations),
-            'income_bracket': random.choice(income_brackets),
-            'credit_score': random.randint(300, 850),
-            'customer_segment': random.choice(segments),
-            'city': cities[city_idx],
-            'state': states[city_idx],
-            'country': 'USA',
-            'account_open_date': (datetime.now() - timedelta(days=random.randint(30, 3650))).strftime('%Y-%m-%d'),
-            'customer_status': random.choice(['Active'] * 9 + ['Inactive'])
-        })
-
-    conn.execute("DELETE FROM dim_customer")
-    conn.executemany("""
-        INSERT INTO dim_customer VALUES (
-            ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
-        )
-    """, [(c['customer_key'], c['customer_id'], c['first_name'], c['last_name'],
-           c['age'], c['gender'], c['occupation'], c['income_bracket'],
-           c['credit_score'], c['customer_segment'], c['city'], c['state'],
-           c['country'], c['account_open_date'], c['customer_status']) for c in customers])
-
-    print(f"  Generated {len(customers)} customer records")
+    n = NUM_CUSTOMERS
+    keys = np.arange(1, n + 1)
+    city_idx = rng.integers(0, len(cities), n)
+    columns = {
+        'customer_key': keys,
+        'customer_id': np.char.mod('CUST%06d', keys),
+        'first_name': np.array(first_names)[rng.integers(0, len(first_names), n)],
+        'last_name': np.array(last_names)[rng.integers(0, len(last_names), n)],
+        'age': rng.integers(18, 81, n),
+        'gender': np.array(['M', 'F'])[rng.integers(0, 2, n)],
+        'occupation': np.array(occupations)[rng.integers(0, len(occupations), n)],
+        'income_bracket': np.array(income_brackets)[rng.integers(0, len(income_brackets), n)],
+        'credit_score': rng.integers(300, 851, n),
+        'customer_segment': np.array(segments)[rng.integers(0, len(segments), n)],
+        'city': np.array(cities)[city_idx],
+        'state': np.array(states)[city_idx],
+        'country': np.full(n, 'USA'),
+        'account_open_date': (
+            pd.Timestamp.now().normalize() - pd.to_timedelta(rng.integers(30, 3651, n), unit='D')
+        ).date,
+        'customer_status': np.where(rng.random(n) < 0.9, 'Active', 'Inactive'),
+    }
+
+    insert_columns(conn, 'dim_customer', columns)
+
+    print(f"  Generated {n} customer records")
 
 def generate_account_dimension(conn):
     """Generate account dimension"""
@@ -113,30 +130,27 @@ def generate_account_dimension(conn):
     branch_names = ['Downtown', 'Uptown', 'Westside', 'Eastside', 'Central']
     regions = ['North', 'South', 'East', 'West', 'Central']
 
-    accounts = []
-    for i in range(1, NUM_ACCOUNTS + 1):
-        acc_type = random.choice(account_types)
-        branch_idx = random.randint(0, len(branches) - 1)
-        accounts.append({
-            'account_key': i,
-            'account_id': f'ACC{i:08d}',
-            'account_type': acc_type,
-            'account_subtype': random.choice(account_subtypes[acc_type]),
-            'interest_rate': round(random.uniform(0.01, 5.0), 2),
-            'account_status': random.choice(statuses),
-            'branch_id': branches[branch_idx],
-            'branch_name': branch_names[branch_idx],
-            'region': regions[branch_idx]
-        })
-
-    conn.execute("DELETE FROM dim_account")
-    conn.executemany("""
-        INSERT INTO dim_account VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, [(a['account_key'], a['account_id'], a['account_type'], a['account_subtype'],
-           a['interest_rate'], a['account_status'], a['branch_id'], a['branch_name'],
-           a['region']) for a in accounts])
-
-    print(f"  Generated {len(accounts)} account records")
+    n = NUM_ACCOUNTS
+    keys = np.arange(1, n + 1)
+    type_idx = rng.integers(0, len(account_types), n)
+    branch_idx = rng.integers(0, len(branches), n)
+    # Subtypes as a (type, subtype) grid, picked per row by its type
+    subtype_grid = np.array([account_subtypes[t] for t in account_types])
+    columns = {
+        'account_key': keys,
+        'account_id': np.char.mod('ACC%08d', keys),
+        'account_type': np.array(account_types)[type_idx],
+        'account_subtype': subtype_grid[type_idx, rng.integers(0, subtype_grid.shape[1], n)],
+        'interest_rate': np.round(rng.uniform(0.01, 5.0, n), 2),
+        'account_status': np.array(statuses)[rng.integers(0, len(statuses), n)],
+        'branch_id': np.array(branches)[branch_idx],
+        'branch_name': np.array(branch_names)[branch_idx],
+        'region': np.array(regions)[branch_idx],
+    }
+
+    insert_columns(conn, 'dim_account', columns)
+
+    print(f"  Generated {n} account records")
 
 def generate_product_dimension(conn):
     """Generate product dimension"""
@@ -165,10 +179,7 @@ def generate_product_dimension(conn):
     for i, (pid, name, cat, ptype, risk, comm) in enumerate(products, 1):
         product_records.append((i, pid, name, cat, ptype, risk, comm))
 
-    conn.execute("DELETE FROM dim_product")
-    conn.executemany("""
-        INSERT INTO dim_product VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, product_records)
+    append_rows(conn, 'dim_product', product_records)
 
     print(f"  Generated {len(product_records)} product records")
 
@@ -189,94 +200,67 @@ def generate_transaction_type_dimension(conn):
         (10, 'Bill Payment', 'Debit', True, False),
     ]
 
-    conn.execute("DELETE FROM dim_transaction_type")
-    conn.executemany("""
-        INSERT INTO dim_transaction_type VALUES (?, ?, ?, ?, ?)
-    """, transaction_types)
+    append_rows(conn, 'dim_transaction_type', transaction_types)
 
     print(f"  Generated {len(transaction_types)} transaction type records")
 
-def generate_fact_transactions(conn):
+def generate_fact_transactions(conn, date_keys):
     """Generate transaction facts"""
     print("Generating transaction facts...")
 
-    # Get date keys
-    date_keys = conn.execute("SELECT date_key FROM dim_date").fetchall()
-    date_keys = [d[0] for d in date_keys]
-
     channels = ['ATM', 'Online', 'Mobile App', 'Branch', 'Phone']
     statuses = ['Completed', 'Completed', 'Completed', 'Completed', 'Pending', 'Failed']
 
-    transactions = []
-    for i in range(1, NUM_TRANSACTIONS + 1):
-        transaction_amount = round(random.uniform(10, 10000), 2)
-        is_debit = random.choice([True, False])
-
-        transactions.append({
-            'transaction_key': i,
-            'date_key': random.choice(date_keys),
-            'customer_key': random.randint(1, NUM_CUSTOMERS),
-            'account_key': random.randint(1, NUM_ACCOUNTS),
-            'transaction_type_key': random.randint(1, 10),
-            'transaction_amount': transaction_amount,
-            'balance_after_transaction': round(random.uniform(100, 50000), 2),
-            'transaction_fee': round(random.uniform(0, 5), 2) if random.random() < 0.3 else 0,
-            'transaction_status': random.choice(statuses),
-            'channel': random.choice(channels)
-        })
-
-    conn.execute("DELETE FROM fact_transactions")
-    conn.executemany("""
-        INSERT INTO fact_transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, [(t['transaction_key'], t['date_key'], t['customer_key'], t['account_key'],
-           t['transaction_type_key'], t['transaction_amount'], t['balance_after_transaction'],
-           t['transaction_fee'], t['transaction_status'], t['channel']) for t in transactions])
-
-    print(f"  Generated {len(transactions)} transaction records")
-
-def generate_fact_loans(conn):
+    n = NUM_TRANSACTIONS
+    columns = {
+        'transaction_key': np.arange(1, n + 1),
+        'date_key': rng.choice(date_keys, n),
+        'customer_key': rng.integers(1, NUM_CUSTOMERS + 1, n),
+        'account_key': rng.integers(1, NUM_ACCOUNTS + 1, n),
+        'transaction_type_key': rng.integers(1, 11, n),
+        'transaction_amount': np.round(rng.uniform(10, 10000, n), 2),
+        'balance_after_transaction': np.round(rng.uniform(100, 50000, n), 2),
+        'transaction_fee': np.where(rng.random(n) < 0.3, np.round(rng.uniform(0, 5, n), 2), 0.0),
+        'transaction_status': np.array(statuses)[rng.integers(0, len(statuses), n)],
+        'channel': np.array(channels)[rng.integers(0, len(channels), n)],
+    }
+
+    insert_columns(conn, 'fact_transactions', columns)
+
+    print(f"  Generated {n} transaction records")
+
+def generate_fact_loans(conn, date_keys):
     """Generate loan facts"""
     print("Generating loan facts...")
 
-    date_keys = conn.execute("SELECT date_key FROM dim_date").fetchall()
-    date_keys = [d[0] for d in date_keys]
-
     loan_statuses = ['Active', 'Active', 'Active', 'Closed', 'Defaulted']
 
-    loans = []
-    for i in range(1, 500):
-        loan_amount = round(random.uniform(5000, 500000), 2)
-        interest_rate = round(random.uniform(3.5, 12.0), 2)
-        loan_term = random.choice([12, 24, 36, 48, 60, 120, 240, 360])
-        monthly_payment = round(loan_amount * (interest_rate/100/12) / (1 - (1 + interest_rate/100/12)**(-loan_term)), 2)
-        principal_paid = round(random.uniform(0, loan_amount), 2)
-        outstanding = loan_amount - principal_paid
-
-        loans.append({
-            'loan_key': i,
-            'date_key': random.choice(date_keys),
-            'customer_key': random.randint(1, NUM_CUSTOMERS),
-            'product_key': random.randint(1, 5),  # Loan products
-            'loan_amount': loan_amount,
-            'interest_rate': interest_rate,
-            'loan_term_months': loan_term,
-            'monthly_payment': monthly_payment,
-            'outstanding_balance': outstanding,
-            'principal_paid': principal_paid,
-            'interest_paid': round(random.uniform(0, loan_amount * 0.3), 2),
-            'loan_status': random.choice(loan_statuses),
-            'default_flag': random.random() < 0.05
-        })
-
-    conn.execute("DELETE FROM fact_loans")
-    conn.executemany("""
-        INSERT INTO fact_loans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, [(l['loan_key'], l['date_key'], l['customer_key'], l['product_key'],
-           l['loan_amount'], l['interest_rate'], l['loan_term_months'], l['monthly_payment'],
-           l['outstanding_balance'], l['principal_paid'], l['interest_paid'],
-           l['loan_status'], l['default_flag']) for l in loans])
-
-    print(f"  Generated {len(loans)} loan records")
+    n = 499
+    loan_amounts = np.round(rng.uniform(5000, 500000, n), 2)
+    interest_rates = np.round(rng.uniform(3.5, 12.0, n), 2)
+    loan_terms = rng.choice([12, 24, 36, 48, 60, 120, 240, 360], n)
+    principal_paid = np.round(rng.uniform(0, loan_amounts), 2)
+    monthly_rates = interest_rates / 100 / 12
+
+    columns = {
+        'loan_key': np.arange(1, n + 1),
+        'date_key': rng.choice(date_keys, n),
+        'customer_key': rng.integers(1, NUM_CUSTOMERS + 1, n),
+        'product_key': rng.integers(1, 6, n),  # Loan products
+        'loan_amount': loan_amounts,
+        'interest_rate': interest_rates,
+        'loan_term_months': loan_terms,
+        'monthly_payment': np.round(loan_amounts * monthly_rates / (1 - (1 + monthly_rates) ** -loan_terms), 2),
+        'outstanding_balance': loan_amounts - principal_paid,
+        'principal_paid': principal_paid,
+        'interest_paid': np.round(rng.uniform(0, loan_amounts * 0.3), 2),
+        'loan_status': np.array(loan_statuses)[rng.integers(0, len(loan_statuses), n)],
+        'default_flag': rng.random(n) < 0.05,
+    }
+
+    insert_columns(conn, 'fact_loans', columns)
+
+    print(f"  Generated {n} loan records")
 
 def main():
     """Main function to generate all sample data"""
@@ -285,6 +269,11 @@ def main():
 
     print(f"Creating database at: {db_path}")
 
+    # Always build from scratch: the schema uses plain CREATE TABLE, and
+    # loading into fresh tables needs no per-table DELETE beforehand
+    db_path.unlink(missing_ok=True)
+    Path(str(db_path) + '.wal').unlink(missing_ok=True)
+
     # Connect to DuckDB
     conn = duckdb.connect(str(db_path))
 
@@ -296,16 +285,28 @@ def main():
             if statement.strip():
                 conn.execute(statement)
 
-    # Generate dimensions
-    generate_date_dimension(conn)
-    generate_customer_dimension(conn)
-    generate_account_dimension(conn)
-    generate_product_dimension(conn)
-    generate_transaction_type_dimension(conn)
-
-    # Generate facts
-    generate_fact_transactions(conn)
-    generate_fact_loans(conn)
+    # Generate dimensions: they do not depend on each other, so they load
+    # concurrently, each on its own cursor (a connection is not thread-safe)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(run_on_cursor, conn, generator)
+            for generator in (generate_customer_dimension, generate_account_dimension,
+                              generate_product_dimension, generate_transaction_type_dimension)
+        ]
+        date_keys = generate_date_dimension(conn)
+        for future in futures:
+            future.result()
+
+    # Load the facts in one transaction: a single commit and WAL flush
+    # instead of one per statement
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        generate_fact_transactions(conn, date_keys)
+        generate_fact_loans(conn, date_keys)
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
 
     # Show summary
     print("\n" + "="*50)
@@ -2,13 +2,110 @@
 LLM-based Intent Parser
 Uses local Ollama to understand user questions and map to semantic layer
 """
+import hashlib
 import json
+import queue
 import re
-from typing import Dict, List, Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
 import ollama
 from semantic_layer.models import QueryIntent
 from semantic_layer.semantic_layer import SemanticLayer
 
+_LIMIT_RE = re.compile(r'top (\d+)')
+# Any number in a question (years, counts), part of its semantic cache key
+_NUMBER_RE = re.compile(r'\d+')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+_RESPONSE_SYSTEM_PROMPT = (
+    'You are a helpful data analyst. Provide clear, concise answers with specific numbers from the data.'
+)
+
+# Keyword rules for the fallback parser: (pattern, name). Patterns match
+# anywhere in the lowercased question, like a substring test, so
+# 'transaction' also hits 'transactions'
+_FALLBACK_METRICS = (
+    (re.compile(r'transaction|volume|sales'), 'transaction_volume'),
+    (re.compile(r'count|number of|how many'), 'total_transactions'),
+    (re.compile(r'deposit'), 'total_deposits'),
+    (re.compile(r'withdrawal'), 'total_withdrawals'),
+    (re.compile(r'loan'), 'total_loan_amount'),
+)
+_FALLBACK_GROUP_BY = (
+    (re.compile(r'by month|monthly|per month'), 'month_name'),
+    (re.compile(r'by year|yearly|annually'), 'year'),
+    (re.compile(r'by region|per region'), 'region'),
+    (re.compile(r'by customer|per customer'), 'customer_segment'),
+    (re.compile(r'by account type|per account'), 'account_type'),
+)
+# First matching phrase wins
+_FALLBACK_TIME_PERIODS = (
+    ('this year', "d_date.year = YEAR(CURRENT_DATE)"),
+    ('last year', "d_date.year = YEAR(CURRENT_DATE) - 1"),
+    ('this month', "d_date.month = MONTH(CURRENT_DATE) AND d_date.year = YEAR(CURRENT_DATE)"),
+)
+
+
+def _normalize(question: str) -> str:
+    """Cache key form of a question: lowercased, whitespace collapsed"""
+    return _WHITESPACE_RE.sub(' ', question.strip().lower())
+
+
+def _format_metric_value(value, fmt: Optional[str]) -> str:
+    """Render a metric value according to its semantic-layer format"""
+    if fmt == 'currency':
+        return f"${value:,.2f}"
+    if fmt == 'percentage':
+        return f"{value:,.2f}%"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return f"{value:,.2f}"
+
+
+def _response_prompt_prefix(question: str) -> str:
+    """Leading part of the answer prompt, known before the query runs"""
+    return f'User asked: "{question}"\n\n'
+
+
+def _read_json_object(chunks) -> str:
+    """
+    Accumulate streamed chat chunks until the first JSON object is closed
+    Closing the stream early stops the model generating trailing tokens
+    """
+    parts = []
+    depth = 0
+    started = in_string = escaped = False
+    try:
+        for chunk in chunks:
+            text = chunk['message']['content']
+            for i, ch in enumerate(text):
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif ch == '\\':
+                        escaped = True
+                    elif ch == '"':
+                        in_string = False
+                elif ch == '"':
+                    in_string = True
+                elif ch == '{':
+                    depth += 1
+                    started = True
+                elif ch == '}':
+                    depth -= 1
+                    if started and depth == 0:
+                        parts.append(text[:i + 1])
+                        return ''.join(parts)
+            parts.append(text)
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+    return ''.join(parts)
+
 
 class IntentParser:
     """
@@ -16,48 +113,83 @@ class IntentParser:
     Uses LLM for understanding, NOT for SQL generation
     """
 
-    def __init__(self, semantic_layer: SemanticLayer, model: str = "llama3.2:3b"):
+    # How long Ollama keeps the model (and its cached prompt prefix) loaded
+    # after a request, so turns a few minutes apart skip the reload
+    KEEP_ALIVE = "30m"
+
+    def __init__(self, semantic_layer: SemanticLayer, model: str = "llama3.2:3b", cache_max_entries: int = 512):
         self.semantic_layer = semantic_layer
         self.model = model
 
+        # LLM-parsed intents keyed by normalized question, and LLM answers
+        # keyed by digest of (normalized question, results shown); LRU-bounded
+        self._intent_cache: 'OrderedDict[str, QueryIntent]' = OrderedDict()
+        self._response_cache: 'OrderedDict[bytes, str]' = OrderedDict()
+        self._cache_max_entries = cache_max_entries
+        self._prefill_pool: Optional[ThreadPoolExecutor] = None
+
+        # The semantic layer is static for the parser's lifetime, so the
+        # metric/dimension listings and their prompt blocks are built once
+        self.metrics_info = semantic_layer.list_available_metrics()
+        self.dimensions_info = semantic_layer.list_available_dimensions()
+        self._metrics_str = "\n".join(f"- {m['name']}: {m['description']}" for m in self.metrics_info)
+        self._dimensions_str = "\n".join(
+            f"- {d['name']}: {', '.join(d['attributes'])}" for d in self.dimensions_info
+        )
+        self._system_prompt = self._build_system_prompt()
+
     def parse(self, question: str) -> QueryIntent:
         """
         Parse user question into QueryIntent
         LLM maps natural language -> semantic concepts, NOT to SQL
+        Repeated questions are answered from cache without calling the LLM
         """
-        # Get available metrics and dimensions
-        metrics_info = self.semantic_layer.list_available_metrics()
-        dimensions_info = self.semantic_layer.list_available_dimensions()
+        key = _normalize(question)
+        cached = self._intent_cache.get(key)
+        if cached is not None:
+            self._intent_cache.move_to_end(key)
+            return cached.model_copy(update={'original_question': question}, deep=True)
 
         # Build prompt for LLM
-        prompt = self._build_prompt(question, metrics_info, dimensions_info)
+        prompt = self._build_prompt(question)
 
         # Call local LLM
         try:
-            response = ollama.chat(
+            stream = ollama.chat(
                 model=self.model,
                 messages=[
                     {
                         'role': 'system',
-                        'content': 'You are a data analyst assistant. Parse user questions into structured query components. Respond ONLY with valid JSON.'
+                        'content': self._system_prompt
                     },
                     {
                         'role': 'user',
                         'content': prompt
                     }
                 ],
+                # Constrained decoding: the model can only emit a JSON
+                # object, so no prose wrapper to budget tokens for or strip
+                format='json',
                 options={
                     'temperature': 0.1,  # Low temperature for consistent parsing
-                    'num_predict': 500
-                }
+                    'num_predict': 200
+                },
+                keep_alive=self.KEEP_ALIVE,
+                stream=True
             )
 
-            # Parse LLM response
-            intent_data = self._extract_json(response['message']['content'])
+            # Parse LLM response, stopping generation once the object closes
+            intent_data = self._extract_json(_read_json_object(stream))
+
+            # Truncated/invalid JSON or no metrics: use the keyword parser
+            # and leave the question uncached, so the LLM is retried next time
+            metrics = intent_data.get('metrics') if intent_data else None
+            if not (isinstance(metrics, list) and metrics):
+                return self._fallback_parse(question)
 
             # Create QueryIntent
             intent = QueryIntent(
-                metrics=intent_data.get('metrics', []),
+                metrics=metrics,
                 dimensions=intent_data.get('dimensions', []),
                 filters=intent_data.get('filters', []),
                 group_by=intent_data.get('group_by', []),
@@ -66,6 +198,11 @@ class IntentParser:
                 original_question=question
             )
 
+            # Only successful LLM parses are cached
+            self._intent_cache[key] = intent.model_copy(deep=True)
+            if len(self._intent_cache) > self._cache_max_entries:
+                self._intent_cache.popitem(last=False)
+
             return intent
 
         except Exception as e:
@@ -73,20 +210,24 @@ class IntentParser:
             # Fallback to keyword-based parsing
             return self._fallback_parse(question)
 
-    def _build_prompt(self, question: str, metrics: List[Dict], dimensions: List[Dict]) -> str:
-        """Build prompt for LLM intent parsing"""
-        metrics_str = "\n".join([f"- {m['name']}: {m['description']}" for m in metrics])
-        dimensions_str = "\n".join([f"- {d['name']}: {', '.join(d['attributes'])}" for d in dimensions])
+    def clear_cache(self) -> None:
+        """Drop cached intents and answers, e.g. after the semantic layer is reloaded"""
+        self._intent_cache.clear()
+        self._response_cache.clear()
 
-        prompt = f"""Parse this user question into structured query components.
-
-Question: "{question}"
+    def _build_system_prompt(self) -> str:
+        """
+        Static part of the intent prompt: instructions and the semantic catalog
+        Sent first and byte-identical every turn, so Ollama reuses its KV
+        cache for this prefix and only prefills the question
+        """
+        return f"""You are a data analyst assistant. Parse user questions into structured query components. Respond ONLY with valid JSON.
 
 Available Metrics:
-{metrics_str}
+{self._metrics_str}
 
 Available Dimensions:
-{dimensions_str}
+{self._dimensions_str}
 
 IMPORTANT: Map the question to the available metrics and dimensions. Do NOT generate SQL.
 
@@ -106,30 +247,34 @@ Response:
   "filters": [],
   "time_period": "year = YEAR(CURRENT_DATE)",
   "limit": null
-}}
+}}"""
+
+    def _build_prompt(self, question: str) -> str:
+        """Build the per-question part of the intent prompt"""
+        return f"""Parse this user question into structured query components.
+
+Question: "{question}"
 
 Now parse the user's question and respond ONLY with the JSON object:"""
 
-        return prompt
+    def _extract_json(self, text: str) -> Optional[Dict]:
+        """Decode the LLM's JSON-mode response; None if it is not a JSON object"""
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return data if isinstance(data, dict) else None
 
-    def _extract_json(self, text: str) -> Dict:
-        """Extract JSON from LLM response"""
-        # Try to find JSON in the response
-        json_match = re.search(r'\{.*\}', text, re.DOTALL)
-        if json_match:
-            try:
-                return json.loads(json_match.group())
-            except json.JSONDecodeError:
-                pass
-
-        # If no valid JSON found, return empty structure
-        return {
-            'metrics': [],
-            'group_by': [],
-            'filters': [],
-            'time_period': None,
-            'limit': None
-        }
+    def cache_key(self, question: str) -> tuple:
+        """
+        Slots the keyword parser finds in question, plus its numbers
+        Questions that embed alike but differ here ask for different data
+        """
+        intent = self._fallback_parse(question)
+        return (
+            tuple(intent.metrics), tuple(intent.group_by), tuple(intent.filters),
+            intent.time_period, intent.limit, tuple(_NUMBER_RE.findall(question))
+        )
 
     def _fallback_parse(self, question: str) -> QueryIntent:
         """
@@ -139,45 +284,22 @@ Now parse the user's question and respond ONLY with the JSON object:"""
         question_lower = question.lower()
 
         # Detect metrics using keywords
-        metrics = []
-        if any(word in question_lower for word in ['transaction', 'volume', 'sales']):
-            metrics.append('transaction_volume')
-        if any(word in question_lower for word in ['count', 'number of', 'how many']):
-            metrics.append('total_transactions')
-        if 'deposit' in question_lower:
-            metrics.append('total_deposits')
-        if 'withdrawal' in question_lower:
-            metrics.append('total_withdrawals')
-        if 'loan' in question_lower:
-            metrics.append('total_loan_amount')
+        metrics = [name for pattern, name in _FALLBACK_METRICS if pattern.search(question_lower)]
         if 'customer' in question_lower and 'count' in question_lower:
             metrics.append('active_customers')
 
         # Detect grouping dimensions
-        group_by = []
-        if any(word in question_lower for word in ['by month', 'monthly', 'per month']):
-            group_by.append('month_name')
-        if any(word in question_lower for word in ['by year', 'yearly', 'annually']):
-            group_by.append('year')
-        if any(word in question_lower for word in ['by region', 'per region']):
-            group_by.append('region')
-        if any(word in question_lower for word in ['by customer', 'per customer']):
-            group_by.append('customer_segment')
-        if any(word in question_lower for word in ['by account type', 'per account']):
-            group_by.append('account_type')
+        group_by = [name for pattern, name in _FALLBACK_GROUP_BY if pattern.search(question_lower)]
 
         # Detect time period
-        time_period = None
-        if 'this year' in question_lower:
-            time_period = "d_date.year = YEAR(CURRENT_DATE)"
-        elif 'last year' in question_lower:
-            time_period = "d_date.year = YEAR(CURRENT_DATE) - 1"
-        elif 'this month' in question_lower:
-            time_period = "d_date.month = MONTH(CURRENT_DATE) AND d_date.year = YEAR(CURRENT_DATE)"
+        time_period = next(
+            (condition for phrase, condition in _FALLBACK_TIME_PERIODS if phrase in question_lower),
+            None
+        )
 
         # Detect limit
         limit = None
-        limit_match = re.search(r'top (\d+)', question_lower)
+        limit_match = _LIMIT_RE.search(question_lower)
         if limit_match:
             limit = int(limit_match.group(1))
 
@@ -191,34 +313,68 @@ Now parse the user's question and respond ONLY with the JSON object:"""
             original_question=question
         )
 
-    def generate_natural_response(self, question: str, results: List[Dict], sql_query: str) -> str:
+    def generate_natural_response(
+        self, question: str, results: List[Dict], sql_query: str, row_count: Optional[int] = None
+    ) -> str:
         """
         Generate natural language response from query results
         Uses LLM to format the answer naturally
+        results may be just the leading rows; row_count is the full total
+        """
+        return "".join(
+            self.generate_natural_response_stream(question, results, sql_query, row_count)
+        ).strip()
+
+    def generate_natural_response_stream(
+        self, question: str, results: List[Dict], sql_query: str, row_count: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Same answer as generate_natural_response, yielded in pieces as the
+        LLM produces them so the caller can show it while it is decoded
         """
         if not results:
-            return "I couldn't find any data matching your question."
+            yield "I couldn't find any data matching your question."
+            return
+        if row_count is None:
+            row_count = len(results)
+
+        # A single row of plain metric values needs no LLM to phrase it
+        quick = row_count == 1 and self._metric_values_response(results)
+        if quick:
+            yield quick
+            return
 
         # Prepare results summary
         results_summary = self._summarize_results(results)
 
-        prompt = f"""User asked: "{question}"
-
-Query Results (showing top {min(len(results), 10)} rows):
+        # The answer only depends on the question and what the prompt shows
+        # of the results, so identical turns reuse the previous answer
+        key = hashlib.blake2b(
+            f"{_normalize(question)}\0{row_count}\0{results_summary}".encode(),
+            digest_size=16
+        ).digest()
+        cached = self._response_cache.get(key)
+        if cached is not None:
+            self._response_cache.move_to_end(key)
+            yield cached
+            return
+
+        prompt = _response_prompt_prefix(question) + f"""Query Results (showing top {min(len(results), 10)} rows):
 {results_summary}
 
-Total rows returned: {len(results)}
+Total rows returned: {row_count}
 
 Generate a concise, natural language response to the user's question based on these results.
 Include key insights and specific numbers. Keep it under 100 words."""
 
+        parts = []
         try:
-            response = ollama.chat(
+            stream = ollama.chat(
                 model=self.model,
                 messages=[
                     {
                         'role': 'system',
-                        'content': 'You are a helpful data analyst. Provide clear, concise answers with specific numbers from the data.'
+                        'content': _RESPONSE_SYSTEM_PROMPT
                     },
                     {
                         'role': 'user',
@@ -228,34 +384,113 @@ Include key insights and specific numbers. Keep it under 100 words."""
                 options={
                     'temperature': 0.3,
                     'num_predict': 200
-                }
+                },
+                keep_alive=self.KEEP_ALIVE,
+                stream=True
             )
-
-            return response['message']['content'].strip()
+            for chunk in stream:
+                text = chunk['message']['content']
+                if text:
+                    parts.append(text)
+                    yield text
 
         except Exception as e:
             print(f"Error generating response: {e}")
-            # Fallback to simple summary
-            return self._simple_summary(results)
+            # Fallback to simple summary, unless part of the answer is already out
+            if not parts:
+                yield self._simple_summary(results, row_count)
+            return
+
+        answer = "".join(parts).strip()
+        self._response_cache[key] = answer
+        if len(self._response_cache) > self._cache_max_entries:
+            self._response_cache.popitem(last=False)
+
+    def start_natural_response(
+        self, question: str, results: List[Dict], sql_query: str, row_count: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Start generating the answer on a background thread right away
+        Returns an iterator over its pieces, so the caller can render the
+        results while the LLM is already decoding
+        """
+        chunks: 'queue.Queue[Optional[str]]' = queue.Queue()
+
+        def produce():
+            try:
+                for text in self.generate_natural_response_stream(question, results, sql_query, row_count):
+                    chunks.put(text)
+            finally:
+                chunks.put(None)
+
+        threading.Thread(target=produce, daemon=True).start()
+        return iter(chunks.get, None)
+
+    def _metric_values_response(self, results: List[Dict]) -> Optional[str]:
+        """Templated answer for a single row whose columns are all metrics"""
+        if len(results) != 1:
+            return None
+
+        sentences = []
+        for name, value in results[0].items():
+            metric = self.semantic_layer.metrics.get(name)
+            if metric is None or not isinstance(value, (int, float, Decimal)):
+                return None
+            sentences.append(f"{metric.description} is {_format_metric_value(value, metric.format)}.")
+        return " ".join(sentences)
+
+    def warm_up(self) -> Future:
+        """
+        Load the model and prefill the intent system prompt in the background
+        Called at startup so the first question does not pay for the load
+        """
+        return self._submit_prefill([{'role': 'system', 'content': self._system_prompt}])
+
+    def prefill_response(self, question: str) -> Future:
+        """
+        Start prefilling the answer prompt in the background
+        Meant to run while the query executes: the answer request shares
+        this prefix, so afterwards Ollama only processes the results part
+        """
+        return self._submit_prefill([
+            {'role': 'system', 'content': _RESPONSE_SYSTEM_PROMPT},
+            {'role': 'user', 'content': _response_prompt_prefix(question)}
+        ])
+
+    def _submit_prefill(self, messages: List[Dict]) -> Future:
+        if self._prefill_pool is None:
+            self._prefill_pool = ThreadPoolExecutor(max_workers=1)
+        return self._prefill_pool.submit(self._prefill, messages)
+
+    def _prefill(self, messages: List[Dict]) -> None:
+        try:
+            ollama.chat(
+                model=self.model,
+                messages=messages,
+                options={'temperature': 0.3, 'num_predict': 1},
+                keep_alive=self.KEEP_ALIVE
+            )
+        except Exception:
+            pass  # Best effort; the answer request works without it
 
     def _summarize_results(self, results: List[Dict], max_rows: int = 10) -> str:
         """Create a text summary of results"""
         if not results:
             return "No data"
 
-        summary_lines = []
-        for i, row in enumerate(results[:max_rows], 1):
-            row_str = ", ".join([f"{k}: {v}" for k, v in row.items()])
-            summary_lines.append(f"{i}. {row_str}")
-
-        return "\n".join(summary_lines)
+        # Every row shares the first row's columns
+        keys = tuple(results[0])
+        return "\n".join(
+            f"{i}. " + ", ".join(f"{k}: {row[k]}" for k in keys)
+            for i, row in enumerate(results[:max_rows], 1)
+        )
 
-    def _simple_summary(self, results: List[Dict]) -> str:
+    def _simple_summary(self, results: List[Dict], row_count: Optional[int] = None) -> str:
         """Generate simple summary without LLM"""
         if not results:
             return "No data found."
 
-        summary = f"Found {len(results)} result(s). "
+        summary = f"Found {len(results) if row_count is None else row_count} result(s). "
 
         if results:
             first_row = results[0]
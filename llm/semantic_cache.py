@@ -0,0 +1,96 @@
+"""
+Semantic Cache - Reuses answers for questions that mean the same thing
+Questions are embedded with a local Ollama embedding model; a new question
+whose cosine similarity to a cached one clears the threshold, and whose
+slot key (metrics, grouping, period, limit...) is the same, is a hit
+"""
+import time
+from typing import Any, Hashable, List, Optional
+import numpy as np
+import ollama
+
+
+class SemanticCache:
+    """
+    Bounded question -> answer cache matched by embedding similarity
+    Vectors live in one contiguous matrix, normalized on insert, so a
+    lookup is a single matrix-vector product. Embeddings barely separate
+    questions that differ in one slot ("this year" / "last year"), so a
+    hit also needs an equal key; entries expire after ttl seconds, as the
+    data behind the cached results may change
+    """
+
+    def __init__(self, model: str = "nomic-embed-text", threshold: float = 0.92, max_entries: int = 256,
+                 ttl: float = 300):
+        self.model = model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = True
+
+        self._vectors: Optional[np.ndarray] = None  # (max_entries, dim), allocated on first insert
+        self._stored_at: Optional[np.ndarray] = None  # time.monotonic() per slot
+        self._keys: List[Hashable] = []
+        self._values: List[Any] = []
+        self._next = 0  # Slot overwritten next once full (oldest entry)
+
+    def embed(self, question: str) -> Optional[np.ndarray]:
+        """Unit-length embedding of question, or None if embeddings are unavailable"""
+        if not self.enabled:
+            return None
+        try:
+            response = ollama.embed(model=self.model, input=question)
+        except Exception as e:
+            # Typically the embedding model is not pulled; stop trying
+            print(f"Semantic cache disabled: {e}")
+            self.enabled = False
+            return None
+
+        vector = np.asarray(response['embeddings'][0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def lookup(self, vector: Optional[np.ndarray], key: Hashable = None) -> Optional[Any]:
+        """Cached value for the most similar fresh question above the threshold with the same key"""
+        if vector is None or not self._values:
+            return None
+
+        count = len(self._values)
+        scores = self._vectors[:count] @ vector
+        fresh = self._stored_at[:count] > time.monotonic() - self.ttl
+        candidates = np.flatnonzero((scores >= self.threshold) & fresh)
+        for slot in candidates[np.argsort(-scores[candidates])]:
+            if self._keys[slot] == key:
+                return self._values[slot]
+        return None
+
+    def store(self, vector: Optional[np.ndarray], value: Any, key: Hashable = None) -> None:
+        """Cache value under vector and key, evicting the oldest entry when full"""
+        if vector is None:
+            return
+        if self._vectors is None:
+            self._vectors = np.empty((self.max_entries, vector.shape[0]), dtype=np.float32)
+            self._stored_at = np.empty(self.max_entries, dtype=np.float64)
+        elif vector.shape[0] != self._vectors.shape[1]:
+            # Embedding model changed underneath us
+            self.clear()
+            return self.store(vector, value, key)
+
+        slot = self._next
+        self._vectors[slot] = vector
+        self._stored_at[slot] = time.monotonic()
+        if slot < len(self._values):
+            self._keys[slot] = key
+            self._values[slot] = value
+        else:
+            self._keys.append(key)
+            self._values.append(value)
+        self._next = (slot + 1) % self.max_entries
+
+    def clear(self) -> None:
+        """Drop all cached entries"""
+        self._vectors = None
+        self._stored_at = None
+        self._keys = []
+        self._values = []
+        self._next = 0
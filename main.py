@@ -11,24 +11,53 @@ from pathlib import Path
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
+from rich.live import Live
 from rich.markdown import Markdown
 from rich import box
 
+# Project paths, resolved once at import
+_ROOT = Path(__file__).resolve().parent
+_SEMANTIC_CFG = _ROOT / "semantic_layer" / "config.yaml"
+_DB_PATH = _ROOT / "database" / "bfsi_olap.duckdb"
+
 # Add project root to path
-sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(_ROOT))
+
+# The pipeline modules (pydantic, ollama, numpy, duckdb) take a few hundred
+# ms to import, so they are loaded in initialize(), after the banner is shown
 
-from semantic_layer.semantic_layer import SemanticLayer
-from llm.intent_parser import IntentParser
-from query_engine.executor import QueryExecutor
+
+def _make_table(*columns, title=None, table_box=box.HEAVY_HEAD) -> Table:
+    """Table in the app's style; columns are names or (name, style) pairs"""
+    table = Table(title=title, show_header=True, header_style="bold magenta", box=table_box)
+    for col in columns:
+        if isinstance(col, str):
+            table.add_column(col)
+        else:
+            table.add_column(col[0], style=col[1])
+    return table
 
 
 class ConversationalAI:
     """Main Conversational AI Application"""
 
+    # Input that runs a command instead of being asked as a question
+    _COMMANDS = {
+        'help': 'show_help',
+        'metrics': 'list_metrics',
+        'dimensions': 'list_dimensions',
+        'tables': 'list_tables',
+    }
+    _QUIT_COMMANDS = frozenset({'quit', 'exit', 'q'})
+
+    # Leading rows handed to the LLM and kept in memory; both only need a sample
+    _SAMPLE_ROWS = 20
+
     def __init__(self):
         self.console = Console()
         self.semantic_layer = None
         self.intent_parser = None
+        self.semantic_cache = None
         self.query_executor = None
 
     def initialize(self):
@@ -36,28 +65,33 @@ class ConversationalAI:
         self.console.print("\n[bold blue]Initializing Conversational AI System...[/bold blue]\n")
 
         try:
+            from semantic_layer.semantic_layer import SemanticLayer
+            from llm.intent_parser import IntentParser
+            from llm.semantic_cache import SemanticCache
+            from query_engine.executor import QueryExecutor
+
+            self.semantic_cache = SemanticCache()
+
             # Initialize semantic layer
             self.console.print("Loading semantic layer...")
-            config_path = Path(__file__).parent / "semantic_layer" / "config.yaml"
-            self.semantic_layer = SemanticLayer(str(config_path))
+            self.semantic_layer = SemanticLayer(str(_SEMANTIC_CFG))
             self.console.print("[green]✓[/green] Semantic layer loaded")
 
             # Initialize query executor
             self.console.print("Connecting to database...")
-            db_path = Path(__file__).parent / "database" / "bfsi_olap.duckdb"
-
-            if not db_path.exists():
+            if not _DB_PATH.exists():
                 self.console.print("[yellow]Database not found. Run setup first![/yellow]")
                 self.console.print("Run: python database/generate_sample_data.py")
                 return False
 
-            self.query_executor = QueryExecutor(str(db_path))
+            self.query_executor = QueryExecutor(str(_DB_PATH))
             self.query_executor.connect()
             self.console.print("[green]✓[/green] Database connected")
 
             # Initialize LLM intent parser
             self.console.print("Loading local LLM (Ollama)...")
             self.intent_parser = IntentParser(self.semantic_layer)
+            self.intent_parser.warm_up()  # Loads the model while the user types
             self.console.print("[green]✓[/green] LLM ready")
 
             self.console.print("\n[bold green]System ready![/bold green]\n")
@@ -70,6 +104,19 @@ class ConversationalAI:
     def process_question(self, question: str):
         """Process user question and return answer"""
         try:
+            # Same question asked before (in any wording, with the same
+            # metrics, grouping, period and limit)? Skip the pipeline
+            question_vec = self.semantic_cache.embed(question)
+            cache_key = self.intent_parser.cache_key(question)
+            cached = self.semantic_cache.lookup(question_vec, cache_key)
+            if cached:
+                sql_query, results, response = cached
+                self.console.print(f"\n[dim]Answered from cache (similar question seen before)[/dim]")
+                self.display_results(results, sql_query)
+                self.console.print(f"\n[bold cyan]Answer:[/bold cyan]")
+                self.console.print(Panel(response, border_style="cyan"))
+                return
+
             # Step 1: Parse intent using LLM
             self.console.print(f"\n[dim]Parsing question...[/dim]")
             intent = self.intent_parser.parse(question)
@@ -78,25 +125,36 @@ class ConversationalAI:
             self.console.print(f"[dim]Generating query via semantic layer...[/dim]")
             sql_query = self.semantic_layer.intent_to_sql(intent)
 
-            # Step 3: Execute SQL
+            # Step 3: Execute SQL, while the LLM prefills the answer prompt
             self.console.print(f"[dim]Executing query...[/dim]")
-            results = self.query_executor.execute(sql_query.sql)
+            self.intent_parser.prefill_response(question)
+            results = self.query_executor.execute(sql_query.sql, sql_query.template, sql_query.params)
 
-            # Step 4: Display results
+            # Step 4: Start the answer, then display results while it decodes
+            answer_stream = self.intent_parser.start_natural_response(
+                question, results.head(self._SAMPLE_ROWS), sql_query.sql, results.row_count
+            )
             self.display_results(results, sql_query)
 
-            # Step 5: Generate natural language response
+            # Step 5: Show the natural language response as it streams in
             self.console.print(f"\n[dim]Generating response...[/dim]")
-            response = self.intent_parser.generate_natural_response(
-                question, results.data, sql_query.sql
-            )
+            response = self.stream_answer(answer_stream)
 
-            self.console.print(f"\n[bold cyan]Answer:[/bold cyan]")
-            self.console.print(Panel(response, border_style="cyan"))
+            self.semantic_cache.store(question_vec, (sql_query, results, response), cache_key)
 
         except Exception as e:
             self.console.print(f"\n[bold red]Error:[/bold red] {str(e)}")
 
+    def stream_answer(self, answer_stream) -> str:
+        """Print the answer panel, filling it in as the LLM generates it"""
+        self.console.print(f"\n[bold cyan]Answer:[/bold cyan]")
+        parts = []
+        with Live(Panel("", border_style="cyan"), console=self.console, refresh_per_second=20) as live:
+            for text in answer_stream:
+                parts.append(text)
+                live.update(Panel("".join(parts).strip(), border_style="cyan"))
+        return "".join(parts).strip()
+
     def display_results(self, results, sql_query):
         """Display query results in a nice table"""
         # Show SQL query
@@ -105,21 +163,19 @@ class ConversationalAI:
 
         # Show execution info
         self.console.print(
-            f"\n[dim]Execution time: {results.execution_time_ms}ms | "
+            f"\n[dim]Execution time: {results.execution_time_ms:.2f}ms | "
             f"Rows: {results.row_count}[/dim]"
         )
 
         # Show data table
-        if results.data:
-            table = Table(show_header=True, header_style="bold magenta", box=box.ROUNDED)
-
-            # Add columns
-            for col in results.columns:
-                table.add_column(col)
+        if results.row_count:
+            table = _make_table(*results.columns, table_box=box.ROUNDED)
 
-            # Add rows (limit to 20 for display)
-            for row in results.data[:20]:
-                table.add_row(*[str(row.get(col, '')) for col in results.columns])
+            # Add rows (limit to 20 for display), stringified column by
+            # column and then transposed into table rows
+            preview = results.head_strings(20)
+            for row in zip(*(preview[col] for col in results.columns)):
+                table.add_row(*row)
 
             if results.row_count > 20:
                 self.console.print(f"\n[dim]Showing first 20 of {results.row_count} rows[/dim]")
@@ -181,46 +237,34 @@ The Semantic Layer handles all SQL generation based on predefined metrics and di
 """
         self.console.print(Markdown(help_text))
 
+    def _print_listing(self, title: str, key_header: str, value_header: str, rows):
+        """Print a two-column (name, details) listing"""
+        table = _make_table((key_header, "cyan"), (value_header, "white"), title=title)
+        for row in rows:
+            table.add_row(*row)
+        self.console.print(table)
+
     def list_metrics(self):
         """List all available metrics"""
-        metrics = self.semantic_layer.list_available_metrics()
-
-        table = Table(title="Available Metrics", show_header=True, header_style="bold magenta")
-        table.add_column("Metric Name", style="cyan")
-        table.add_column("Description", style="white")
-
-        for metric in metrics:
-            table.add_row(metric['name'], metric['description'])
-
-        self.console.print(table)
+        self._print_listing(
+            "Available Metrics", "Metric Name", "Description",
+            ((m['name'], m['description']) for m in self.semantic_layer.list_available_metrics())
+        )
 
     def list_dimensions(self):
         """List all available dimensions"""
-        dimensions = self.semantic_layer.list_available_dimensions()
-
-        table = Table(title="Available Dimensions", show_header=True, header_style="bold magenta")
-        table.add_column("Dimension", style="cyan")
-        table.add_column("Attributes", style="white")
-
-        for dim in dimensions:
-            attrs = ", ".join(dim['attributes'])
-            table.add_row(dim['name'], attrs)
-
-        self.console.print(table)
+        self._print_listing(
+            "Available Dimensions", "Dimension", "Attributes",
+            ((d['name'], ", ".join(d['attributes'])) for d in self.semantic_layer.list_available_dimensions())
+        )
 
     def list_tables(self):
         """List all database tables"""
-        tables = self.query_executor.list_tables()
-
-        table = Table(title="Database Tables", show_header=True, header_style="bold magenta")
-        table.add_column("Table Name", style="cyan")
-        table.add_column("Row Count", style="white")
-
-        for table_name in tables:
-            info = self.query_executor.get_table_info(table_name)
-            table.add_row(table_name, str(info['row_count']))
-
-        self.console.print(table)
+        tables = self.query_executor.get_all_table_info()
+        self._print_listing(
+            "Database Tables", "Table Name", "Row Count",
+            ((name, str(info['row_count'])) for name, info in tables.items())
+        )
 
     def run(self):
         """Main application loop"""
@@ -256,17 +300,14 @@ Type your questions in natural language or use commands like:
                     continue
 
                 # Handle commands
-                if question.lower() in ['quit', 'exit', 'q']:
+                command = question.lower()
+                if command in self._QUIT_COMMANDS:
                     self.console.print("\n[bold]Goodbye![/bold]\n")
                     break
-                elif question.lower() == 'help':
-                    self.show_help()
-                elif question.lower() == 'metrics':
-                    self.list_metrics()
-                elif question.lower() == 'dimensions':
-                    self.list_dimensions()
-                elif question.lower() == 'tables':
-                    self.list_tables()
+
+                handler = self._COMMANDS.get(command)
+                if handler:
+                    getattr(self, handler)()
                 else:
                     # Process as a question
                     self.process_question(question)
@@ -6,22 +6,63 @@ With conversation memory, follow-ups, context awareness, and remote DB support
 Architecture:
 User Question → Context Check → LLM (Intent) → Semantic Layer → SQL → DB → Results → LLM (Response)
 """
+import re
 import sys
 import yaml
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, Sequence
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
+from rich.live import Live
 from rich.markdown import Markdown
 from rich import box
 
-# Add project root to path
-sys.path.insert(0, str(Path(__file__).parent))
+# Project paths, resolved once at import
+_ROOT = Path(__file__).resolve().parent
+_SEMANTIC_CFG = _ROOT / "semantic_layer" / "config.yaml"
+_DB_CFG = _ROOT / "db_config.yaml"
+_HISTORY_FILE = _ROOT / "conversation_history.jsonl"
 
-from semantic_layer.semantic_layer import SemanticLayer
-from semantic_layer.models import QueryIntent
-from llm.intent_parser import IntentParser
-from conversation.memory import ConversationMemory
+# Add project root to path
+sys.path.insert(0, str(_ROOT))
+
+# The pipeline modules (pydantic, ollama, numpy) take a few hundred ms to
+# import, so they are loaded in initialize(), after the banner is shown
+if TYPE_CHECKING:
+    from semantic_layer.models import QueryIntent
+
+# Follow-up keywords and how each rewrites the previous intent:
+# (keyword, slot, value). Keywords match anywhere in the lowercased question;
+# when several hit the same slot, the one listed first wins
+_CONTEXT_RULES = (
+    ('deposit', 'metrics', ('total_deposits',)),
+    ('withdrawal', 'metrics', ('total_withdrawals',)),
+    ('loan', 'metrics', ('total_loan_amount',)),
+    ('customer', 'metrics', ('active_customers',)),
+    ('by month', 'group_by', ('month_name',)),
+    ('by year', 'group_by', ('year',)),
+    ('by region', 'group_by', ('region',)),
+    ('by segment', 'group_by', ('customer_segment',)),
+    ('by customer', 'group_by', ('customer_segment',)),
+    ('by account', 'group_by', ('account_type',)),
+    ('last year', 'time_period', "d_date.year = YEAR(CURRENT_DATE) - 1"),
+    ('this year', 'time_period', "d_date.year = YEAR(CURRENT_DATE)"),
+    ('last month', 'time_period', "d_date.month = MONTH(CURRENT_DATE) - 1"),
+    ('premium', 'filters', ("d_customer.customer_segment = 'Premium'",)),
+    ('gold', 'filters', ("d_customer.customer_segment = 'Gold'",)),
+)
+# Each rule owns the bit at its rank, so within a slot the lowest set bit
+# of the match mask is the winning rule
+_CONTEXT_RULE_RANK = {keyword: rank for rank, (keyword, _, _) in enumerate(_CONTEXT_RULES)}
+_CONTEXT_SLOT_MASKS = {}
+for _rank, (_, _slot, _) in enumerate(_CONTEXT_RULES):
+    _CONTEXT_SLOT_MASKS[_slot] = _CONTEXT_SLOT_MASKS.get(_slot, 0) | 1 << _rank
+# Zero-width lookahead so overlapping keywords ('by customer' and
+# 'customer') are all found in a single pass
+_CONTEXT_RULE_RE = re.compile(
+    '(?=(' + '|'.join(map(re.escape, sorted(_CONTEXT_RULE_RANK, key=len, reverse=True))) + '))'
+)
 
 
 class DatabaseManager:
@@ -36,7 +77,8 @@ class DatabaseManager:
     def _load_config(self) -> dict:
         if self.config_path.exists():
             with open(self.config_path, 'r') as f:
-                return yaml.safe_load(f)
+                # libyaml-backed loader when PyYAML was built with it
+                return yaml.load(f, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
         return {'active': 'local'}
 
     def connect(self) -> bool:
@@ -59,13 +101,18 @@ class DatabaseManager:
         db_path = local_config.get('path', 'database/bfsi_olap.duckdb')
 
         # Resolve relative path
-        full_path = Path(__file__).parent / db_path
+        full_path = _ROOT / db_path
 
         if not full_path.exists():
             print(f"Database not found: {full_path}")
             return False
 
-        self.connector = DuckDBConnector(str(full_path))
+        # Opened read-only; threads and memory_limit are optional tuning knobs
+        self.connector = DuckDBConnector(
+            str(full_path),
+            threads=local_config.get('threads'),
+            memory_limit=local_config.get('memory_limit')
+        )
         self.db_type = 'duckdb'
         return self.connector.connect()
 
@@ -77,8 +124,11 @@ class DatabaseManager:
 
         # Check for connection string first
         conn_string = pg_config.get('connection_string')
+        use_connectorx = pg_config.get('use_connectorx', False)
         if conn_string:
-            self.connector = PostgreSQLConnector.from_connection_string(conn_string)
+            self.connector = PostgreSQLConnector.from_connection_string(
+                conn_string, use_connectorx=use_connectorx
+            )
         else:
             self.connector = PostgreSQLConnector(
                 host=pg_config.get('host', 'localhost'),
@@ -86,15 +136,16 @@ class DatabaseManager:
                 database=pg_config.get('database', 'postgres'),
                 user=pg_config.get('user', 'postgres'),
                 password=pg_config.get('password', ''),
-                ssl=pg_config.get('ssl', True)
+                ssl=pg_config.get('ssl', True),
+                use_connectorx=use_connectorx
             )
 
         self.db_type = 'postgresql'
         return self.connector.connect()
 
-    def execute(self, sql: str):
-        """Execute SQL query"""
-        return self.connector.execute(sql)
+    def execute(self, sql: str, template: Optional[str] = None, params: Sequence[Any] = ()):
+        """Execute SQL query, through a cached prepared plan when a template is given"""
+        return self.connector.execute(sql, template, params)
 
     def list_tables(self):
         """List all tables"""
@@ -104,12 +155,27 @@ class DatabaseManager:
         """Get table info"""
         return self.connector.get_table_info(table_name)
 
+    def get_all_table_info(self):
+        """Get info for every table in one catalog query"""
+        return self.connector.get_all_table_info()
+
     def disconnect(self):
         """Disconnect from database"""
         if self.connector:
             self.connector.disconnect()
 
 
+def _make_table(*columns, title=None, table_box=box.HEAVY_HEAD) -> Table:
+    """Table in the app's style; columns are names or (name, style) pairs"""
+    table = Table(title=title, show_header=True, header_style="bold magenta", box=table_box)
+    for col in columns:
+        if isinstance(col, str):
+            table.add_column(col)
+        else:
+            table.add_column(col[0], style=col[1])
+    return table
+
+
 class ConversationalAI_V2:
     """
     Enhanced Conversational AI with Memory & Multi-DB Support
@@ -119,31 +185,53 @@ class ConversationalAI_V2:
     - Supports local DuckDB and remote PostgreSQL
     """
 
+    # Input that runs a command instead of being asked as a question
+    _COMMANDS = {
+        'help': 'show_help',
+        'metrics': 'list_metrics',
+        'dimensions': 'list_dimensions',
+        'tables': 'list_tables',
+        'history': 'show_history',
+        'clear': 'clear_history',
+        'source': 'show_source',
+    }
+    _QUIT_COMMANDS = frozenset({'quit', 'exit', 'q'})
+
+    # Leading rows handed to the LLM and kept in memory; both only need a sample
+    _SAMPLE_ROWS = 20
+
     def __init__(self):
         self.console = Console()
         self.semantic_layer = None
         self.intent_parser = None
+        self.semantic_cache = None
         self.db_manager = None
-        self.memory = ConversationMemory(
-            max_turns=10,
-            persist_file=str(Path(__file__).parent / "conversation_history.json")
-        )
+        self.memory = None
 
     def initialize(self):
         """Initialize all components"""
         self.console.print("\n[bold blue]Initializing Conversational AI v2...[/bold blue]\n")
 
         try:
+            from semantic_layer.semantic_layer import SemanticLayer
+            from llm.intent_parser import IntentParser
+            from llm.semantic_cache import SemanticCache
+            from conversation.memory import ConversationMemory
+
+            self.memory = ConversationMemory(
+                max_turns=10,
+                persist_file=str(_HISTORY_FILE)
+            )
+            self.semantic_cache = SemanticCache()
+
             # Initialize semantic layer
             self.console.print("Loading semantic layer...")
-            config_path = Path(__file__).parent / "semantic_layer" / "config.yaml"
-            self.semantic_layer = SemanticLayer(str(config_path))
+            self.semantic_layer = SemanticLayer(str(_SEMANTIC_CFG))
             self.console.print("[green]✓[/green] Semantic layer loaded")
 
             # Initialize database manager
             self.console.print("Connecting to database...")
-            db_config_path = Path(__file__).parent / "db_config.yaml"
-            self.db_manager = DatabaseManager(str(db_config_path))
+            self.db_manager = DatabaseManager(str(_DB_CFG))
 
             if not self.db_manager.connect():
                 self.console.print("[yellow]Database connection failed![/yellow]")
@@ -155,6 +243,7 @@ class ConversationalAI_V2:
             # Initialize LLM intent parser
             self.console.print("Loading local LLM (Ollama)...")
             self.intent_parser = IntentParser(self.semantic_layer)
+            self.intent_parser.warm_up()  # Loads the model while the user types
             self.console.print("[green]✓[/green] LLM ready")
 
             # Show memory status
@@ -170,24 +259,50 @@ class ConversationalAI_V2:
             self.console.print(f"[bold red]Initialization failed:[/bold red] {str(e)}")
             return False
 
-    def process_question(self, question: str):
+    def process_question(self, question: str, question_lower: Optional[str] = None):
         """Process user question with context awareness"""
+        if question_lower is None:
+            question_lower = question.lower()
         try:
             # Check if this is a follow-up question
-            is_follow_up = self.memory.is_follow_up(question)
+            is_follow_up = self.memory.is_follow_up(question, question_lower)
 
             if is_follow_up:
                 self.console.print(f"\n[dim]Detected follow-up question...[/dim]")
-                context_intent = self.memory.resolve_follow_up(question)
+                context_intent = self.memory.resolve_follow_up(question, question_lower)
                 self.console.print(f"[dim]Using context from previous query[/dim]")
             else:
                 context_intent = None
 
+            # Standalone questions asked before (in any wording, with the
+            # same metrics, grouping, period and limit) skip the pipeline;
+            # follow-ups depend on context, so they never do
+            question_vec = cache_key = None
+            if not is_follow_up:
+                question_vec = self.semantic_cache.embed(question)
+                cache_key = self.intent_parser.cache_key(question)
+                cached = self.semantic_cache.lookup(question_vec, cache_key)
+                if cached:
+                    intent, sql_query, results, response = cached
+                    self.console.print(f"\n[dim]Answered from cache (similar question seen before)[/dim]")
+                    self.display_results(results, sql_query)
+                    self.console.print(f"\n[bold cyan]Answer:[/bold cyan]")
+                    self.console.print(Panel(response, border_style="cyan"))
+                    self.memory.add_turn(
+                        user_question=question,
+                        parsed_intent=intent.__dict__ if hasattr(intent, '__dict__') else {},
+                        sql_query=sql_query.sql,
+                        results=results.head(self._SAMPLE_ROWS),
+                        response=response,
+                        row_count=results.row_count
+                    )
+                    return
+
             # Step 1: Parse intent using LLM (with context)
             self.console.print(f"[dim]Parsing question...[/dim]")
 
             if is_follow_up and context_intent:
-                intent = self._build_contextual_intent(question, context_intent)
+                intent = self._build_contextual_intent(question, context_intent, question_lower)
             else:
                 intent = self.intent_parser.parse(question)
 
@@ -195,85 +310,70 @@ class ConversationalAI_V2:
             self.console.print(f"[dim]Generating query via semantic layer...[/dim]")
             sql_query = self.semantic_layer.intent_to_sql(intent)
 
-            # Step 3: Execute SQL
-            self.console.print(f"[dim]Executing query on {self.db_manager.db_type}...[/dim]")
-            results = self.db_manager.execute(sql_query.sql)
-
-            # Step 4: Display results
-            self.display_results(results, sql_query, is_follow_up)
-
-            # Step 5: Generate natural language response
-            self.console.print(f"\n[dim]Generating response...[/dim]")
-
             context_for_response = ""
             if is_follow_up:
                 context_for_response = f"(Follow-up to: {self.memory.current_context.get('last_question', '')})"
+            response_question = f"{question} {context_for_response}"
+
+            # Step 3: Execute SQL, while the LLM prefills the answer prompt
+            self.console.print(f"[dim]Executing query on {self.db_manager.db_type}...[/dim]")
+            self.intent_parser.prefill_response(response_question)
+            results = self.db_manager.execute(sql_query.sql, sql_query.template, sql_query.params)
 
-            response = self.intent_parser.generate_natural_response(
-                f"{question} {context_for_response}",
-                results.data,
-                sql_query.sql
+            # Step 4: Start the answer, then display results while it decodes
+            answer_stream = self.intent_parser.start_natural_response(
+                response_question, results.head(self._SAMPLE_ROWS), sql_query.sql, results.row_count
             )
+            self.display_results(results, sql_query, is_follow_up)
 
-            self.console.print(f"\n[bold cyan]Answer:[/bold cyan]")
-            self.console.print(Panel(response, border_style="cyan"))
+            # Step 5: Show the natural language response as it streams in
+            self.console.print(f"\n[dim]Generating response...[/dim]")
+            response = self.stream_answer(answer_stream)
+
+            self.semantic_cache.store(question_vec, (intent, sql_query, results, response), cache_key)
 
             # Step 6: Save to memory
             self.memory.add_turn(
                 user_question=question,
                 parsed_intent=intent.__dict__ if hasattr(intent, '__dict__') else {},
                 sql_query=sql_query.sql,
-                results=results.data,
-                response=response
+                results=results.head(self._SAMPLE_ROWS),
+                response=response,
+                row_count=results.row_count
             )
 
         except Exception as e:
             self.console.print(f"\n[bold red]Error:[/bold red] {str(e)}")
 
-    def _build_contextual_intent(self, question: str, context: dict) -> QueryIntent:
+    def _build_contextual_intent(
+        self, question: str, context: dict, question_lower: Optional[str] = None
+    ) -> 'QueryIntent':
         """Build intent using context from previous query"""
+        from semantic_layer.models import QueryIntent
+
         metrics = context.get('metrics', [])
         group_by = context.get('group_by', [])
         filters = context.get('filters', [])
         time_period = context.get('time_period')
 
-        question_lower = question.lower()
-
-        # Detect metric changes
-        if 'deposit' in question_lower:
-            metrics = ['total_deposits']
-        elif 'withdrawal' in question_lower:
-            metrics = ['total_withdrawals']
-        elif 'loan' in question_lower:
-            metrics = ['total_loan_amount']
-        elif 'customer' in question_lower:
-            metrics = ['active_customers']
-
-        # Detect grouping changes
-        if 'by month' in question_lower:
-            group_by = ['month_name']
-        elif 'by year' in question_lower:
-            group_by = ['year']
-        elif 'by region' in question_lower:
-            group_by = ['region']
-        elif 'by segment' in question_lower or 'by customer' in question_lower:
-            group_by = ['customer_segment']
-        elif 'by account' in question_lower:
-            group_by = ['account_type']
-
-        # Detect time period changes
-        if 'last year' in question_lower:
-            time_period = "d_date.year = YEAR(CURRENT_DATE) - 1"
-        elif 'this year' in question_lower:
-            time_period = "d_date.year = YEAR(CURRENT_DATE)"
-        elif 'last month' in question_lower:
-            time_period = "d_date.month = MONTH(CURRENT_DATE) - 1"
-
-        # Detect filter additions
-        if 'premium' in question_lower:
-            filters = ["d_customer.customer_segment = 'Premium'"]
-        elif 'gold' in question_lower:
-            filters = ["d_customer.customer_segment = 'Gold'"]
+        if question_lower is None:
+            question_lower = question.lower()
+
+        # One scan sets a bit per matched keyword; each slot then takes its
+        # lowest set bit, i.e. the first listed rule that matched
+        mask = 0
+        for match in _CONTEXT_RULE_RE.finditer(question_lower):
+            mask |= 1 << _CONTEXT_RULE_RANK[match.group(1)]
+
+        changes = {}
+        for slot, slot_mask in _CONTEXT_SLOT_MASKS.items():
+            hits = mask & slot_mask
+            if hits:
+                changes[slot] = _CONTEXT_RULES[(hits & -hits).bit_length() - 1][2]
+        metrics = list(changes.get('metrics', metrics))
+        group_by = list(changes.get('group_by', group_by))
+        filters = list(changes.get('filters', filters))
+        time_period = changes.get('time_period', time_period)
 
         if not metrics:
             metrics = context.get('metrics', ['total_transactions'])
@@ -288,6 +388,16 @@ class ConversationalAI_V2:
             original_question=question
         )
 
+    def stream_answer(self, answer_stream) -> str:
+        """Print the answer panel, filling it in as the LLM generates it"""
+        self.console.print(f"\n[bold cyan]Answer:[/bold cyan]")
+        parts = []
+        with Live(Panel("", border_style="cyan"), console=self.console, refresh_per_second=20) as live:
+            for text in answer_stream:
+                parts.append(text)
+                live.update(Panel("".join(parts).strip(), border_style="cyan"))
+        return "".join(parts).strip()
+
     def display_results(self, results, sql_query, is_follow_up=False):
         """Display query results with context indicator"""
         if is_follow_up:
@@ -297,18 +407,17 @@ class ConversationalAI_V2:
         self.console.print(Panel(sql_query.sql, border_style="blue"))
 
         self.console.print(
-            f"\n[dim]Execution time: {results.execution_time_ms}ms | "
+            f"\n[dim]Execution time: {results.execution_time_ms:.2f}ms | "
             f"Rows: {results.row_count} | Source: {self.db_manager.db_type}[/dim]"
         )
 
-        if results.data:
-            table = Table(show_header=True, header_style="bold magenta", box=box.ROUNDED)
+        if results.row_count:
+            table = _make_table(*results.columns, table_box=box.ROUNDED)
 
-            for col in results.columns:
-                table.add_column(col)
-
-            for row in results.data[:20]:
-                table.add_row(*[str(row.get(col, '')) for col in results.columns])
+            # Stringify column by column, then transpose into table rows
+            preview = results.head_strings(20)
+            for row in zip(*(preview[col] for col in results.columns)):
+                table.add_row(*row)
 
             if results.row_count > 20:
                 self.console.print(f"\n[dim]Showing first 20 of {results.row_count} rows[/dim]")
@@ -374,46 +483,34 @@ Then try these follow-ups:
         self.memory.clear()
         self.console.print("[green]Conversation history cleared.[/green]")
 
+    def _print_listing(self, title: str, key_header: str, value_header: str, rows):
+        """Print a two-column (name, details) listing"""
+        table = _make_table((key_header, "cyan"), (value_header, "white"), title=title)
+        for row in rows:
+            table.add_row(*row)
+        self.console.print(table)
+
     def list_metrics(self):
         """List all available metrics"""
-        metrics = self.semantic_layer.list_available_metrics()
-
-        table = Table(title="Available Metrics", show_header=True, header_style="bold magenta")
-        table.add_column("Metric Name", style="cyan")
-        table.add_column("Description", style="white")
-
-        for metric in metrics:
-            table.add_row(metric['name'], metric['description'])
-
-        self.console.print(table)
+        self._print_listing(
+            "Available Metrics", "Metric Name", "Description",
+            ((m['name'], m['description']) for m in self.semantic_layer.list_available_metrics())
+        )
 
     def list_dimensions(self):
         """List all available dimensions"""
-        dimensions = self.semantic_layer.list_available_dimensions()
-
-        table = Table(title="Available Dimensions", show_header=True, header_style="bold magenta")
-        table.add_column("Dimension", style="cyan")
-        table.add_column("Attributes", style="white")
-
-        for dim in dimensions:
-            attrs = ", ".join(dim['attributes'])
-            table.add_row(dim['name'], attrs)
-
-        self.console.print(table)
+        self._print_listing(
+            "Available Dimensions", "Dimension", "Attributes",
+            ((d['name'], ", ".join(d['attributes'])) for d in self.semantic_layer.list_available_dimensions())
+        )
 
     def list_tables(self):
         """List all database tables"""
-        tables = self.db_manager.list_tables()
-
-        table = Table(title=f"Database Tables ({self.db_manager.db_type})", show_header=True, header_style="bold magenta")
-        table.add_column("Table Name", style="cyan")
-        table.add_column("Row Count", style="white")
-
-        for table_name in tables:
-            info = self.db_manager.get_table_info(table_name)
-            table.add_row(table_name, str(info['row_count']))
-
-        self.console.print(table)
+        tables = self.db_manager.get_all_table_info()
+        self._print_listing(
+            f"Database Tables ({self.db_manager.db_type})", "Table Name", "Row Count",
+            ((name, str(info['row_count'])) for name, info in tables.items())
+        )
 
     def run(self):
         """Main application loop"""
@@ -452,25 +549,17 @@ Then try these follow-ups:
                     continue
 
                 # Handle commands
-                if question.lower() in ['quit', 'exit', 'q']:
+                command = question.lower()
+                if command in self._QUIT_COMMANDS:
                     self.console.print("\n[bold]Goodbye![/bold]\n")
                     break
-                elif question.lower() == 'help':
-                    self.show_help()
-                elif question.lower() == 'metrics':
-                    self.list_metrics()
-                elif question.lower() == 'dimensions':
-                    self.list_dimensions()
-                elif question.lower() == 'tables':
-                    self.list_tables()
-                elif question.lower() == 'history':
-                    self.show_history()
-                elif question.lower() == 'clear':
-                    self.clear_history()
-                elif question.lower() == 'source':
-                    self.show_source()
+
+                handler = self._COMMANDS.get(command)
+                if handler:
+                    getattr(self, handler)()
                 else:
-                    self.process_question(question)
+                    # Process as a question, reusing the lowercased copy
+                    self.process_question(question, command)
 
             except KeyboardInterrupt:
                 self.console.print("\n\n[bold]Goodbye![/bold]\n")
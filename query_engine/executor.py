@@ -1,86 +1,98 @@
 """
 Query Executor - Executes SQL queries against DuckDB
 """
-import duckdb
-import time
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional, Sequence
 from pathlib import Path
-from semantic_layer.models import QueryResult
+from connectors.base import QueryResult
+from connectors.duckdb_connector import DuckDBConnector, DuckDBPool
+
+if TYPE_CHECKING:
+    import pyarrow
 
 
 class QueryExecutor:
-    """Execute SQL queries and return results"""
+    """
+    Execute SQL queries and return results
+    A thin layer over DuckDBConnector, which owns the cursor pool, the
+    prepared statements and the result cache
+    """
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, cache_max_entries: int = 256, cache_ttl: float = 60, pool_size: int = 4):
         self.db_path = Path(db_path)
-        self.conn = None
+        self.connector = DuckDBConnector(
+            str(self.db_path), pool_size=pool_size,
+            cache_max_entries=cache_max_entries, cache_ttl=cache_ttl
+        )
+
+    @property
+    def pool(self) -> Optional[DuckDBPool]:
+        """The connector's cursor pool, while connected"""
+        return self.connector.pool
+
+    @property
+    def conn(self):
+        """The shared database handle, while connected"""
+        return self.connector.conn
 
     def connect(self):
         """Connect to DuckDB database"""
         if not self.db_path.exists():
             raise FileNotFoundError(f"Database not found: {self.db_path}")
-
-        self.conn = duckdb.connect(str(self.db_path), read_only=True)
+        if not self.connector.connect():
+            raise Exception(f"Could not open database: {self.db_path}")
 
     def disconnect(self):
         """Close database connection"""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        self.connector.disconnect()
+
+    def invalidate(self):
+        """Drop cached results, e.g. after the data has changed"""
+        self.connector.clear_cache()
 
-    def execute(self, sql: str) -> QueryResult:
+    def execute(self, sql: str, template: Optional[str] = None, params: Sequence[Any] = ()) -> QueryResult:
         """
         Execute SQL query and return results
+        With a template (sql with $1, $2... placeholders) and its params,
+        the plan is prepared once and reused by later calls that differ
+        only in those values; without params the sql runs as is
+        Repeated SELECTs within the cache TTL are answered from memory
         """
-        if not self.conn:
-            self.connect()
-
-        start_time = time.time()
-
         try:
-            # Execute query
-            result = self.conn.execute(sql)
-
-            # Fetch all results
-            rows = result.fetchall()
-            columns = [desc[0] for desc in result.description]
-
-            # Convert to list of dicts
-            data = []
-            for row in rows:
-                data.append(dict(zip(columns, row)))
-
-            execution_time = (time.time() - start_time) * 1000  # ms
-
-            return QueryResult(
-                data=data,
-                columns=columns,
-                row_count=len(data),
-                sql_query=sql,
-                execution_time_ms=round(execution_time, 2)
-            )
-
+            return self.connector.execute(sql, template, params)
         except Exception as e:
             raise Exception(f"Query execution failed: {str(e)}\nSQL: {sql}")
 
+    def execute_stream(self, sql: str, chunk_size: int = 10_000) -> Iterator['pyarrow.RecordBatch']:
+        """
+        Execute SQL query and yield the result as Arrow record batches
+        Only one batch is held in memory at a time, so large results can be
+        counted or aggregated without materializing them; the cursor stays
+        borrowed until the generator is exhausted or closed
+        """
+        with self.connector.cursor() as cursor:
+            try:
+                reader = cursor.execute(sql).to_arrow_reader(chunk_size)
+            except Exception as e:
+                raise Exception(f"Query execution failed: {str(e)}\nSQL: {sql}")
+            yield from reader
+
     def get_table_info(self, table_name: str) -> Dict[str, Any]:
         """Get information about a table"""
-        if not self.conn:
-            self.connect()
+        with self.connector.cursor() as cursor:
+            # Get row count
+            count_result = cursor.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()
+            row_count = count_result[0] if count_result else 0
 
-        # Get row count
-        count_result = self.conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()
-        row_count = count_result[0] if count_result else 0
+            # Get column info, fetched column-wise: name, type, null
+            describe = cursor.execute(f"DESCRIBE {table_name}").to_arrow_table()
 
-        # Get column info
-        columns_result = self.conn.execute(f"DESCRIBE {table_name}").fetchall()
         columns = [
             {
-                'name': col[0],
-                'type': col[1],
-                'null': col[2]
+                'name': name,
+                'type': col_type,
+                'null': null
             }
-            for col in columns_result
+            for name, col_type, null in zip(*(describe.column(i).to_pylist() for i in range(3)))
         ]
 
         return {
@@ -89,13 +101,13 @@ class QueryExecutor:
             'columns': columns
         }
 
+    def get_all_table_info(self) -> Dict[str, Dict[str, Any]]:
+        """Row counts for every table, from one catalog query"""
+        return self.connector.get_all_table_info()
+
     def list_tables(self) -> List[str]:
         """List all tables in the database"""
-        if not self.conn:
-            self.connect()
-
-        result = self.conn.execute("SHOW TABLES").fetchall()
-        return [row[0] for row in result]
+        return self.connector.list_tables()
 
     def __enter__(self):
         """Context manager entry"""
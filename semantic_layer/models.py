@@ -1,11 +1,16 @@
 """
-Data models for semantic layer using Pydantic
+Data models for semantic layer
+Metric and Dimension are built once from the trusted config and never
+change, so they are plain slotted dataclasses; the models exchanged
+with the LLM are validated with Pydantic
 """
+from dataclasses import dataclass
 from typing import Dict, List, Optional, Any
 from pydantic import BaseModel, Field
 
 
-class Metric(BaseModel):
+@dataclass(slots=True, frozen=True)
+class Metric:
     """Represents a business metric"""
     name: str
     description: str
@@ -13,14 +18,28 @@ class Metric(BaseModel):
     table: str
     aggregation: str
     format: Optional[str] = "number"
+    # Resolved once when the config is loaded: "<sql> AS <name>", the
+    # domain ('transactions', 'loans' or 'investments') that picks the
+    # fact table, and whether its SQL needs dim_transaction_type joined
+    # in as tt
+    select_expr: str = ""
+    domain: str = "transactions"
+    requires_txn_type: bool = False
 
 
-class Dimension(BaseModel):
+@dataclass(slots=True, frozen=True)
+class Dimension:
     """Represents a dimension for grouping/filtering"""
     name: str
     table: str
     key: str
     attributes: Dict[str, str]
+    # SELECT / GROUP BY expressions for the default (first) attribute and
+    # the JOIN clause with a {fact} placeholder for the fact table alias,
+    # resolved once when the config is loaded
+    select_expr: str = ""
+    group_expr: str = ""
+    join_template: str = ""
 
 
 class QueryIntent(BaseModel):
@@ -39,12 +58,8 @@ class SQLQuery(BaseModel):
     sql: str
     intent: QueryIntent
     explanation: str
-
-
-class QueryResult(BaseModel):
-    """Represents query execution results"""
-    data: List[Dict[str, Any]]
-    columns: List[str]
-    row_count: int
-    sql_query: str
-    execution_time_ms: float
+    # Same statement with the integer filter literals and the LIMIT as $1,
+    # $2... placeholders, so connectors can reuse one prepared plan across
+    # turns; None when there is nothing to bind
+    template: Optional[str] = None
+    params: List[Any] = Field(default_factory=list)
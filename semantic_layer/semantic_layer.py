@@ -2,12 +2,141 @@
 Core Semantic Layer Implementation
 Translates business intent to SQL queries
 """
+import functools
+import os
+import pickle
 import yaml
 import re
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 from .models import Metric, Dimension, QueryIntent, SQLQuery
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
+try:
+    import ahocorasick  # pip install pyahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Metric domain, tagged from the first key its table mentions, and the
+# fact table (with alias) each domain is queried from; the first requested
+# metric outside the default domain decides
+_DOMAIN_KEYS = (('loan', 'loans'), ('investment', 'investments'))
+_DEFAULT_DOMAIN = 'transactions'
+_FACT_TABLE_BY_DOMAIN = {
+    'transactions': "fact_transactions ft",
+    'loans': "fact_loans fl",
+    'investments': "fact_investments fi",
+}
+
+# Returned for an intent with no metrics and no grouping
+_EMPTY_SQL = "SELECT 1 WHERE FALSE"
+
+# In a filter condition: a quoted string or identifier (left alone) or an
+# integer compared against, which becomes a template parameter
+# ("year = 2024" -> "year = $n")
+_FILTER_LITERAL_RE = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|(<=|>=|<>|!=|=|<|>)(\s*)(\d+)(?![\w.])""")
+
+# Runs of word characters; a keyword made only of these can only occur
+# inside a single token of the searched text
+_TOKEN_RE = re.compile(r'[a-z0-9_]+')
+
+
+@functools.lru_cache(maxsize=8)
+def _load_yaml(path: str, mtime_ns: int) -> Dict:
+    """
+    Parsed YAML file, cached per (path, modification time)
+    The result is shared between callers, so treat it as read-only
+    """
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=_YamlLoader)
+
+
+class _SearchIndex:
+    """
+    Case-insensitive substring search over a few short fields per object
+    Every substring of every token maps to the objects containing it, so
+    a single-word keyword is one dict lookup; other keywords (spaces,
+    punctuation) fall back to scanning the pre-lowercased fields
+    """
+
+    def __init__(self, fields: Dict[str, List[str]]):
+        self.fields = {name: [text.lower() for text in texts] for name, texts in fields.items()}
+        self.substrings: Dict[str, set] = {}
+        for name, texts in self.fields.items():
+            for text in texts:
+                for token in _TOKEN_RE.findall(text):
+                    for i in range(len(token)):
+                        for j in range(i + 1, len(token) + 1):
+                            self.substrings.setdefault(token[i:j], set()).add(name)
+
+    def search(self, keywords: List[str]) -> set:
+        """Names of the objects where any keyword occurs in any field"""
+        found = set()
+        for keyword in keywords:
+            keyword_lower = keyword.lower()
+            if _TOKEN_RE.fullmatch(keyword_lower):
+                found |= self.substrings.get(keyword_lower, set())
+            else:
+                found.update(
+                    name for name, texts in self.fields.items()
+                    if any(keyword_lower in text for text in texts)
+                )
+        return found
+
+
+class _TermScanner:
+    """
+    Finds known terms in free text in one pass
+    Whole-word, leftmost-longest matches without overlaps; uses an
+    Aho-Corasick automaton when pyahocorasick is installed, otherwise
+    one alternation regex
+    """
+
+    def __init__(self, terms: Dict[str, List[Tuple[str, str]]]):
+        self.terms = terms
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for term in terms:
+                self._automaton.add_word(term, term)
+            self._automaton.make_automaton()
+            self._regex = None
+        else:
+            self._automaton = None
+            # Longest first, so the alternation prefers the longest term
+            alternatives = '|'.join(map(re.escape, sorted(terms, key=len, reverse=True)))
+            self._regex = re.compile(rf'(?<!\w)(?:{alternatives})(?!\w)')
+
+    def find(self, text: str) -> List[str]:
+        """Terms occurring as whole words in the lowercased text, in order"""
+        if self._regex is not None:
+            return self._regex.findall(text)
+        # All occurrences in one pass; keep the longest whole-word term per
+        # start position, then take them left to right without overlaps,
+        # exactly as the regex alternation would
+        longest: Dict[int, str] = {}
+        for end, term in self._automaton.iter(text):
+            start = end - len(term) + 1
+            if (start == 0 or not _is_word_char(text[start - 1])) and \
+                    (end + 1 == len(text) or not _is_word_char(text[end + 1])) and \
+                    len(term) > len(longest.get(start, '')):
+                longest[start] = term
+        found = []
+        next_start = 0
+        for start in sorted(longest):
+            if start >= next_start:
+                found.append(longest[start])
+                next_start = start + len(longest[start])
+        return found
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
 
 class SemanticLayer:
     """
@@ -15,18 +144,108 @@ class SemanticLayer:
     This is the key component that avoids direct LLM->SQL generation
     """
 
-    def __init__(self, config_path: str):
-        """Initialize semantic layer with configuration"""
+    # Attributes built from the config and saved in the snapshot sidecar;
+    # bump the version whenever their shape changes
+    _SNAPSHOT_ATTRS = (
+        'config', 'metrics', 'dimensions', 'business_terms',
+        '_metric_index', '_dimension_index', '_metric_search', '_dimension_search',
+        '_scan_terms',
+    )
+    _SNAPSHOT_VERSION = 4
+
+    # Rendered statements kept for repeated intents
+    _SQL_CACHE_MAX_ENTRIES = 256
+
+    def __init__(self, config_path: str, use_snapshot: bool = True):
+        """
+        Initialize semantic layer with configuration
+        The parsed and indexed config is kept in a pickle next to the YAML
+        file and reused while the YAML is unchanged
+        """
         self.config_path = Path(config_path)
+        stat = self.config_path.stat()
+        snapshot_key = (self._SNAPSHOT_VERSION, stat.st_mtime_ns, stat.st_size)
+        snapshot_path = self.config_path.with_suffix('.pickle')
+
+        if not (use_snapshot and self._load_snapshot(snapshot_path, snapshot_key)):
+            self._build()
+            if use_snapshot:
+                self._save_snapshot(snapshot_path, snapshot_key)
+
+        # Rendered SQL per intent (minus the question): key -> (sql,
+        # template, params, explanation), least recently used first
+        self._sql_cache: 'OrderedDict[tuple, Tuple[str, Optional[str], Tuple[Any, ...], str]]' = OrderedDict()
+
+        # Matcher over _scan_terms, compiled on first scan()
+        self._scanner: Optional[_TermScanner] = None
+
+        # Catalog listings, built on first request
+        self._metrics_listing: Optional[List[Dict[str, str]]] = None
+        self._dimensions_listing: Optional[List[Dict[str, Any]]] = None
+
+    def _build(self):
+        """Parse the config and build the lookup indexes"""
         self.config = self._load_config()
         self.metrics = self._parse_metrics()
         self.dimensions = self._parse_dimensions()
         self.business_terms = self.config.get('business_terms', {})
 
+        # Name or synonym -> object, so lookups are a single dict probe;
+        # real names are merged last so they win over a same-named synonym
+        self._metric_index = self._build_index(self.metrics)
+        self._dimension_index = self._build_index(self.dimensions)
+
+        # Keyword search over metric name/description and dimension
+        # name/attribute names
+        self._metric_search = _SearchIndex(
+            {name: [name, m.description] for name, m in self.metrics.items()}
+        )
+        self._dimension_search = _SearchIndex(
+            {name: [name, *d.attributes] for name, d in self.dimensions.items()}
+        )
+
+        # Lowercased term -> [(kind, canonical name)] for scan(): metric and
+        # dimension names and synonyms plus dimension attribute names, each
+        # also in its spaced form ("loan_amount" -> "loan amount")
+        self._scan_terms: Dict[str, List[Tuple[str, str]]] = {}
+        entries = [
+            *(('metric', term, m.name) for term, m in self._metric_index.items()),
+            *(('dimension', term, d.name) for term, d in self._dimension_index.items()),
+            *(('dimension', attr, d.name) for d in self.dimensions.values() for attr in d.attributes),
+        ]
+        for kind, term, name in entries:
+            term = term.lower()
+            for variant in {term, term.replace('_', ' ')}:
+                hits = self._scan_terms.setdefault(variant, [])
+                if (kind, name) not in hits:
+                    hits.append((kind, name))
+
+    def _load_snapshot(self, path: Path, key: tuple) -> bool:
+        """Restore built state from the sidecar if it matches the config"""
+        try:
+            with open(path, 'rb') as f:
+                snapshot_key, state = pickle.load(f)
+        except Exception:
+            return False  # Missing, unreadable or from an older version
+        if snapshot_key != key:
+            return False
+        self.__dict__.update(state)
+        return True
+
+    def _save_snapshot(self, path: Path, key: tuple):
+        """Write built state to the sidecar (best effort)"""
+        state = {name: getattr(self, name) for name in self._SNAPSHOT_ATTRS}
+        tmp_path = path.with_name(path.name + '.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((key, state), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass  # e.g. read-only install; the YAML is parsed next time too
+
     def _load_config(self) -> Dict:
         """Load semantic layer configuration"""
-        with open(self.config_path, 'r') as f:
-            return yaml.safe_load(f)
+        return _load_yaml(str(self.config_path), self.config_path.stat().st_mtime_ns)
 
     def _parse_metrics(self) -> Dict[str, Metric]:
         """Parse metrics from configuration"""
@@ -38,7 +257,12 @@ class SemanticLayer:
                 sql=config['sql'],
                 table=config['table'],
                 aggregation=config['aggregation'],
-                format=config.get('format', 'number')
+                format=config.get('format', 'number'),
+                select_expr=f"{config['sql']} AS {name}",
+                domain=next(
+                    (domain for key, domain in _DOMAIN_KEYS if key in config['table'].lower()), _DEFAULT_DOMAIN
+                ),
+                requires_txn_type='dim_transaction_type' in config['table']
             )
         return metrics
 
@@ -46,158 +270,161 @@ class SemanticLayer:
         """Parse dimensions from configuration"""
         dimensions = {}
         for name, config in self.config.get('dimensions', {}).items():
+            attributes = config['attributes']
+            # Queries group by the first attribute, or the dimension name
+            attr_name = next(iter(attributes), name)
+            attr_sql = attributes.get(attr_name, attr_name)
+            table, key = config['table'], config['key']
+            alias = table.replace('dim_', 'd_')
             dimensions[name] = Dimension(
                 name=name,
                 table=config['table'],
                 key=config['key'],
-                attributes=config['attributes']
+                attributes=attributes,
+                select_expr=f"{attr_sql} AS {attr_name}",
+                group_expr=attr_sql,
+                join_template=f"LEFT JOIN {table} {alias} ON {{fact}}.{key} = {alias}.{key}"
             )
         return dimensions
 
+    def _build_index(self, objects: Dict[str, Any]) -> Dict[str, Any]:
+        """Map every name and business-term synonym to its object"""
+        synonyms = {
+            term: objects[target]
+            for term, target in self.business_terms.items()
+            if target in objects
+        }
+        return {**synonyms, **objects}
+
     def get_metric(self, metric_name: str) -> Optional[Metric]:
         """Get metric by name or synonym"""
-        # Direct lookup
-        if metric_name in self.metrics:
-            return self.metrics[metric_name]
-
-        # Check business terms synonyms
-        if metric_name in self.business_terms:
-            actual_name = self.business_terms[metric_name]
-            if actual_name in self.metrics:
-                return self.metrics[actual_name]
-
-        return None
+        return self._metric_index.get(metric_name)
 
     def get_dimension(self, dim_name: str) -> Optional[Dimension]:
         """Get dimension by name or synonym"""
-        # Direct lookup
-        if dim_name in self.dimensions:
-            return self.dimensions[dim_name]
-
-        # Check business terms synonyms
-        if dim_name in self.business_terms:
-            actual_name = self.business_terms[dim_name]
-            if actual_name in self.dimensions:
-                return self.dimensions[actual_name]
-
-        return None
+        return self._dimension_index.get(dim_name)
 
     def search_metrics(self, keywords: List[str]) -> List[Metric]:
         """Search for metrics matching keywords"""
-        matches = []
-        for metric in self.metrics.values():
-            for keyword in keywords:
-                keyword_lower = keyword.lower()
-                if (keyword_lower in metric.name.lower() or
-                    keyword_lower in metric.description.lower()):
-                    matches.append(metric)
-                    break
-        return matches
+        found = self._metric_search.search(keywords)
+        return [metric for name, metric in self.metrics.items() if name in found]
 
     def search_dimensions(self, keywords: List[str]) -> List[Dimension]:
         """Search for dimensions matching keywords"""
-        matches = []
-        for dimension in self.dimensions.values():
-            for keyword in keywords:
-                keyword_lower = keyword.lower()
-                if (keyword_lower in dimension.name.lower() or
-                    any(keyword_lower in attr.lower() for attr in dimension.attributes.keys())):
-                    matches.append(dimension)
-                    break
-        return matches
+        found = self._dimension_search.search(keywords)
+        return [dimension for name, dimension in self.dimensions.items() if name in found]
+
+    def scan(self, text: str) -> List[Tuple[str, str]]:
+        """
+        Metrics and dimensions mentioned in free text, as (kind, name)
+        pairs in order of first mention; kind is 'metric' or 'dimension'
+        """
+        if self._scanner is None:
+            self._scanner = _TermScanner(self._scan_terms)
+        found = {}
+        for term in self._scanner.find(text.lower()):
+            for hit in self._scan_terms[term]:
+                found.setdefault(hit)
+        return list(found)
 
     def intent_to_sql(self, intent: QueryIntent) -> SQLQuery:
         """
         Convert query intent to SQL
         This is where semantic layer translates to SQL, NOT the LLM
         """
-        # Build SELECT clause
-        select_parts = []
-
-        # Add dimensions to SELECT
-        for dim_name in intent.group_by:
-            dim = self.get_dimension(dim_name)
-            if dim:
-                # Use the first attribute or a default one
-                attr_name = list(dim.attributes.keys())[0] if dim.attributes else dim_name
-                attr_sql = dim.attributes.get(attr_name, attr_name)
-                select_parts.append(f"{attr_sql} AS {attr_name}")
-
-        # Add metrics to SELECT
-        for metric_name in intent.metrics:
-            metric = self.get_metric(metric_name)
-            if metric:
-                select_parts.append(f"{metric.sql} AS {metric_name}")
-
-        # Build FROM clause
-        # Determine which fact table to use based on metrics
-        from_table = self._determine_fact_table(intent)
-
-        # Build JOIN clauses
-        joins = self._build_joins(intent, from_table)
+        # Nothing to measure or group by: answer with an empty result
+        # instead of a SELECT * over the whole fact table
+        if not intent.metrics and not intent.group_by:
+            return SQLQuery(
+                sql=_EMPTY_SQL,
+                intent=intent,
+                explanation="No metrics specified"
+            )
 
-        # Build WHERE clause
-        where_clauses = []
-        if intent.filters:
-            where_clauses.extend(intent.filters)
-        if intent.time_period:
-            where_clauses.append(intent.time_period)
+        # The same intent asked again reuses the rendered statement
+        key = (
+            tuple(intent.metrics), tuple(intent.group_by), tuple(intent.dimensions),
+            tuple(intent.filters), intent.time_period, intent.limit
+        )
+        rendered = self._sql_cache.get(key)
+        if rendered is None:
+            rendered = self._render_sql(intent)
+            self._sql_cache[key] = rendered
+            if len(self._sql_cache) > self._SQL_CACHE_MAX_ENTRIES:
+                self._sql_cache.popitem(last=False)
+        else:
+            self._sql_cache.move_to_end(key)
+        sql, template, params, explanation = rendered
 
-        # Build GROUP BY clause
-        group_by_parts = []
-        for i, dim_name in enumerate(intent.group_by, 1):
-            dim = self.get_dimension(dim_name)
-            if dim:
-                attr_name = list(dim.attributes.keys())[0] if dim.attributes else dim_name
-                attr_sql = dim.attributes.get(attr_name, attr_name)
-                group_by_parts.append(attr_sql)
+        return SQLQuery(
+            sql=sql,
+            intent=intent,
+            explanation=explanation,
+            template=template,
+            params=list(params)
+        )
 
-        # Construct SQL
-        sql_parts = []
-        sql_parts.append("SELECT")
-        sql_parts.append("  " + ",\n  ".join(select_parts) if select_parts else "  *")
-        sql_parts.append(f"FROM {from_table}")
+    def _render_sql(self, intent: QueryIntent) -> Tuple[str, Optional[str], Tuple[Any, ...], str]:
+        """SQL, its template (None when there is nothing to bind), the template's params and the explanation"""
+        # Resolve names once; unknown ones are skipped
+        group_dims = [self._dimension_index[d] for d in intent.group_by if d in self._dimension_index]
+        metrics = [self._metric_index[m] for m in intent.metrics if m in self._metric_index]
 
-        if joins:
-            sql_parts.extend(joins)
+        # SELECT dimensions, then metrics (aliased by canonical name, even
+        # when asked for by synonym)
+        select_parts = [dim.select_expr for dim in group_dims] + [m.select_expr for m in metrics]
 
-        if where_clauses:
-            sql_parts.append("WHERE " + " AND ".join(where_clauses))
+        # Build FROM clause
+        # Determine which fact table to use based on metrics
+        from_table = self._determine_fact_table(metrics)
 
-        if group_by_parts:
-            sql_parts.append("GROUP BY " + ", ".join(group_by_parts))
+        # Build JOIN clauses
+        joins = self._build_joins(intent, metrics, from_table)
 
+        # Build WHERE clause
+        where_clauses = [*intent.filters, intent.time_period] if intent.time_period else intent.filters
+
+        # Construct SQL; the template has $n placeholders for the integer
+        # filter literals and the LIMIT, so e.g. "year = 2024" and
+        # "year = 2025" share one prepared plan
+        where = " AND ".join(where_clauses)
+        params: List[Any] = []
+
+        def to_param(match: 're.Match') -> str:
+            if not match.group(3):
+                return match.group(0)  # Quoted string or identifier
+            params.append(int(match.group(3)))
+            return f"{match.group(1)}{match.group(2)}${len(params)}"
+
+        where_template = _FILTER_LITERAL_RE.sub(to_param, where)
+        select_from = (
+            "SELECT\n  " + (",\n  ".join(select_parts) if select_parts else "*")
+            + f"\nFROM {from_table}"
+            + "".join("\n" + join for join in joins)
+        )
+        group_by = "\nGROUP BY " + ", ".join(dim.group_expr for dim in group_dims) if group_dims else ""
+        sql = select_from + ("\nWHERE " + where if where else "") + group_by
+        template = select_from + ("\nWHERE " + where_template if where else "") + group_by
         if intent.limit:
-            sql_parts.append(f"LIMIT {intent.limit}")
-
-        sql = "\n".join(sql_parts)
+            sql += f"\nLIMIT {intent.limit}"
+            params.append(intent.limit)
+            template += f"\nLIMIT ${len(params)}"
 
         # Generate explanation
         explanation = self._generate_explanation(intent)
 
-        return SQLQuery(
-            sql=sql,
-            intent=intent,
-            explanation=explanation
-        )
+        # Nothing to bind: run the SQL as is rather than preparing it
+        if not params:
+            return sql, None, (), explanation
+        return sql, template, tuple(params), explanation
 
-    def _determine_fact_table(self, intent: QueryIntent) -> str:
+    def _determine_fact_table(self, metrics: List[Metric]) -> str:
         """Determine which fact table to query based on metrics"""
         # Default to transactions
-        fact_table = "fact_transactions ft"
-
-        # Check which metrics are requested
-        for metric_name in intent.metrics:
-            metric = self.get_metric(metric_name)
-            if metric:
-                if 'loan' in metric.table.lower():
-                    return "fact_loans fl"
-                elif 'investment' in metric.table.lower():
-                    return "fact_investments fi"
-
-        return fact_table
+        domain = next((m.domain for m in metrics if m.domain != _DEFAULT_DOMAIN), _DEFAULT_DOMAIN)
+        return _FACT_TABLE_BY_DOMAIN[domain]
 
-    def _build_joins(self, intent: QueryIntent, from_table: str) -> List[str]:
+    def _build_joins(self, intent: QueryIntent, metrics: List[Metric], from_table: str) -> List[str]:
         """Build JOIN clauses based on dimensions needed"""
         joins = []
         joined_tables = set()
@@ -207,17 +434,13 @@ class SemanticLayer:
 
         # Add joins for dimensions
         for dim_name in intent.group_by + intent.dimensions:
-            dim = self.get_dimension(dim_name)
+            dim = self._dimension_index.get(dim_name)
             if dim and dim.table not in joined_tables:
-                alias = dim.table.replace('dim_', 'd_')
-                joins.append(
-                    f"LEFT JOIN {dim.table} {alias} "
-                    f"ON {fact_alias}.{dim.key} = {alias}.{dim.key}"
-                )
+                joins.append(dim.join_template.format(fact=fact_alias))
                 joined_tables.add(dim.table)
 
         # Add join for transaction_type if needed for deposits/withdrawals
-        if any('deposit' in m or 'withdrawal' in m for m in intent.metrics):
+        if any(m.requires_txn_type for m in metrics):
             if 'dim_transaction_type' not in joined_tables:
                 joins.append(
                     f"LEFT JOIN dim_transaction_type tt "
@@ -247,15 +470,19 @@ class SemanticLayer:
         return " | ".join(parts) if parts else "Simple query"
 
     def list_available_metrics(self) -> List[Dict[str, str]]:
-        """List all available metrics"""
-        return [
-            {"name": m.name, "description": m.description}
-            for m in self.metrics.values()
-        ]
+        """List all available metrics (built once; treat as read-only)"""
+        if self._metrics_listing is None:
+            self._metrics_listing = [
+                {"name": m.name, "description": m.description}
+                for m in self.metrics.values()
+            ]
+        return self._metrics_listing
 
     def list_available_dimensions(self) -> List[Dict[str, str]]:
-        """List all available dimensions"""
-        return [
-            {"name": d.name, "table": d.table, "attributes": list(d.attributes.keys())}
-            for d in self.dimensions.values()
-        ]
+        """List all available dimensions (built once; treat as read-only)"""
+        if self._dimensions_listing is None:
+            self._dimensions_listing = [
+                {"name": d.name, "table": d.table, "attributes": list(d.attributes.keys())}
+                for d in self.dimensions.values()
+            ]
+        return self._dimensions_listing
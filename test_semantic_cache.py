@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test script for the semantic cache (without Ollama)
+Questions that embed alike but ask for different slots must not share answers
+"""
+from pathlib import Path
+import numpy as np
+from semantic_layer.semantic_layer import SemanticLayer
+from llm.intent_parser import IntentParser
+from llm.semantic_cache import SemanticCache
+
+
+def _parser() -> IntentParser:
+    config_path = Path(__file__).parent / "semantic_layer" / "config.yaml"
+    return IntentParser(SemanticLayer(str(config_path)))
+
+
+def test_slot_change_is_not_a_hit():
+    """A cached "this year" answer does not answer "last year\""""
+    parser = _parser()
+    cache = SemanticCache()
+
+    # Both questions get the same embedding: cosine 1.0, far above the threshold
+    vector = np.ones(8, dtype=np.float32) / np.sqrt(8)
+    this_year = "What are the total deposits this year?"
+    last_year = "What are the total deposits last year?"
+
+    cache.store(vector, "this year's answer", parser.cache_key(this_year))
+    assert cache.lookup(vector, parser.cache_key(this_year)) == "this year's answer"
+    assert cache.lookup(vector, parser.cache_key(last_year)) is None
+
+    # Same for limits and other numbers
+    cache.store(vector, "top 5 answer", parser.cache_key("Top 5 customers by deposits"))
+    assert cache.lookup(vector, parser.cache_key("Top 10 customers by deposits")) is None
+    assert cache.lookup(vector, parser.cache_key("Top 5 customers by deposits")) == "top 5 answer"
+
+
+def test_entries_expire():
+    """Entries older than the TTL are not returned"""
+    cache = SemanticCache(ttl=0)
+    vector = np.ones(8, dtype=np.float32) / np.sqrt(8)
+    cache.store(vector, "stale", key=())
+    assert cache.lookup(vector, key=()) is None
+
+
+if __name__ == '__main__':
+    test_slot_change_is_not_a_hit()
+    test_entries_expire()
+    print("Semantic cache tests passed")
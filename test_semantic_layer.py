@@ -107,5 +107,67 @@ def test_semantic_layer():
     print("="*70 + "\n")
 
 
+def test_scan():
+    """scan() finds whole-word mentions; both matchers agree"""
+    import semantic_layer.semantic_layer as semantic_layer_module
+
+    config_path = Path(__file__).parent / "semantic_layer" / "config.yaml"
+    sl = SemanticLayer(str(config_path))
+
+    found = sl.scan("Show transaction volume by region this year")
+    assert ('metric', 'transaction_volume') in found
+    assert sl.scan("nothing relevant here") == []
+
+    # The Aho-Corasick path (pyahocorasick installed) must give the regex
+    # path's leftmost-longest whole-word results, including when the
+    # longest candidate at a position ends mid-word
+    terms = {'loan': [('metric', 'a')], 'loan amountx': [('metric', 'b')], 'amount': [('metric', 'c')]}
+    texts = ["loan amountxy", "loan amount", "loan amountx", "loans amount"]
+    texts += [m.replace('_', ' ') + " by " + d for m in sl.metrics for d in sl.dimensions]
+    aho = semantic_layer_module.ahocorasick
+    try:
+        semantic_layer_module.ahocorasick = None
+        regex_scanners = [semantic_layer_module._TermScanner(t) for t in (terms, sl._scan_terms)]
+    finally:
+        semantic_layer_module.ahocorasick = aho
+    assert regex_scanners[0].find("loan amountxy") == ['loan']
+    if aho is None:
+        print("pyahocorasick not installed; only the regex matcher was checked")
+        return
+    auto_scanners = [semantic_layer_module._TermScanner(t) for t in (terms, sl._scan_terms)]
+    for regex_scanner, auto_scanner in zip(regex_scanners, auto_scanners):
+        for text in texts:
+            assert auto_scanner.find(text) == regex_scanner.find(text), text
+
+
+def test_sql_template():
+    """Integer filter literals and the LIMIT become template params; strings stay inline"""
+    config_path = Path(__file__).parent / "semantic_layer" / "config.yaml"
+    sl = SemanticLayer(str(config_path))
+
+    def render(year, limit=10):
+        return sl.intent_to_sql(QueryIntent(
+            metrics=["transaction_volume"],
+            group_by=["month_name"],
+            filters=["d_customer.customer_segment = 'Premium'"],
+            time_period=f"d_date.year = {year}",
+            limit=limit,
+            original_question="x"
+        ))
+
+    sql_2024, sql_2025 = render(2024), render(2025)
+    assert "d_date.year = 2024" in sql_2024.sql
+    assert sql_2024.template == sql_2025.template
+    assert "d_date.year = $1" in sql_2024.template and "LIMIT $2" in sql_2024.template
+    assert "'Premium'" in sql_2024.template
+    assert sql_2024.params == [2024, 10] and sql_2025.params == [2025, 10]
+
+    # Nothing to bind: no template, the SQL runs as is
+    plain = sl.intent_to_sql(QueryIntent(metrics=["transaction_volume"], original_question="x"))
+    assert plain.template is None and plain.params == []
+
+
 if __name__ == '__main__':
     test_semantic_layer()
+    test_scan()
+    test_sql_template()